@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""An asyncio driver for PomodoroCore, for headless use without PyQt.
+
+    ctl = AsyncPomodoroControl()
+    await ctl.start(25 * 60)
+    async for seconds_elapsed, seconds_remaining in ctl.time_updates():
+        ...
+    await ctl.wait_complete()
+
+Requires Python 3.7. Everything returned to callers is a plain awaitable
+(a Future, or an object with __anext__), so this module doesn't need the
+async/await syntax itself.
+"""
+import asyncio
+from collections import deque
+
+from PomodoroCore import PomodoroCore
+
+_END = object()
+
+
+class TimeUpdates(object):
+    """An async iterator of (seconds elapsed, seconds remaining) for the
+    current segment. It finishes when the segment completes."""
+    def __init__(self, loop):
+        self.loop = loop
+        self._items = deque()
+        self._waiters = deque()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = self.loop.create_future()
+        if self._items:
+            self._resolve(future, self._items.popleft())
+        else:
+            self._waiters.append(future)
+        return future
+
+    def _resolve(self, future, item):
+        if item is _END:
+            future.set_exception(StopAsyncIteration())
+        else:
+            future.set_result(item)
+
+    def put(self, item):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.cancelled():
+                self._resolve(future, item)
+                return
+        self._items.append(item)
+
+
+class AsyncPomodoroControl(object):
+    """Drives a PomodoroCore from an asyncio event loop. Each running
+    segment costs one call_at() handle, so thousands of sessions can share
+    a single loop."""
+    def __init__(self, loop=None):
+        self._loop = loop
+        self.core = PomodoroCore()
+        self._handle = None
+        self._complete = None
+        self._subscribers = []
+
+    @property
+    def loop(self):
+        """The loop passed in, or else the one running when it is first
+        needed, so a control can be made before its loop runs."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    @property
+    def is_running(self):
+        return self.core.is_running
+
+    @property
+    def seconds_elapsed(self):
+        return self.core.seconds_elapsed
+
+    @property
+    def seconds_remaining(self):
+        return self.core.seconds_remaining
+
+    def now_ms(self):
+        return int(self.loop.time() * 1000)
+
+    def start(self, seconds_remaining):
+        """Begin a segment. Returns a Future that is already done, so
+        callers may await it or not."""
+        self._cancel_handle()
+        if self._complete is not None and not self._complete.done():
+            self._complete.set_result(None)
+        now = self.now_ms()
+        self.core.start(seconds_remaining, now)
+        self._complete = self.loop.create_future()
+        self._schedule(now)
+        self._publish()
+        started = self.loop.create_future()
+        started.set_result(None)
+        return started
+
+    def early_finish(self):
+        self._cancel_handle()
+        self.core.early_finish()
+        self._finish()
+
+    def wait_complete(self):
+        """A Future that resolves when the current segment completes or is
+        finished early."""
+        if self._complete is None or not self.core.is_running:
+            done = self.loop.create_future()
+            done.set_result(None)
+            return done
+        return asyncio.shield(self._complete)
+
+    def time_updates(self):
+        """An async iterator of (seconds elapsed, seconds remaining),
+        starting with the current values."""
+        updates = TimeUpdates(self.loop)
+        if self.core.is_running:
+            updates.put((self.seconds_elapsed, self.seconds_remaining))
+            self._subscribers.append(updates)
+        else:
+            updates.put(_END)
+        return updates
+
+    def _cancel_handle(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self, now):
+        delay = self.core.next_wakeup(now)
+        if delay is not None:
+            self._handle = self.loop.call_at((now + delay) / 1000.,
+                                             self._handle_second)
+
+    def _publish(self):
+        item = (self.seconds_elapsed, self.seconds_remaining)
+        for updates in self._subscribers:
+            updates.put(item)
+
+    def _finish(self):
+        for updates in self._subscribers:
+            updates.put(_END)
+        self._subscribers = []
+        if self._complete is not None and not self._complete.done():
+            self._complete.set_result(None)
+
+    def _handle_second(self):
+        self._handle = None
+        now = self.now_ms()
+        completed = self.core.tick(now)
+        self._schedule(now)
+        self._publish()
+        if completed:
+            self._finish()
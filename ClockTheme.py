@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""The colors, pens and brushes the clock is painted with, derived once
+per palette color instead of on every paint.
+
+A ClockTheme holds everything derived from one color and its outline
+color. Per-alpha colors live in 256-entry lookup tables and pens in
+small pools keyed by width; each entry is made the first time it is
+asked for and reused from then on. THEMES keeps one theme per color
+pair for the whole process, so switching the overlay to the next color
+in the rotation is a dictionary lookup.
+
+The color math is all integer, so nothing hands Qt a float where it
+wants an int.
+"""
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QBrush, QColor, QPen
+
+# Alpha of the elapsed arc, which is drawn faded out.
+ELAPSED_ALPHA = 64
+
+
+def to_color(color):
+    """A QColor from a hex string like PomodoroRotation's colors."""
+    c = int(color, 16)
+    return QColor(c >> 16 & 0xff,
+                  c >> 8  & 0xff,
+                  c       & 0xff)
+
+
+def brighten(color):
+    return QColor(int(color.red() * 0.75 + 64),
+                  int(color.green() * 0.75 + 64),
+                  int(color.blue() * 0.75 + 64))
+
+
+def alpha_level(alpha):
+    return min(255, max(0, int(alpha)))
+
+
+def width_key(width):
+    # Animated widths are rounded to an eighth of a unit so the pools
+    # stay small.
+    return int(round(width * 8))
+
+
+class ClockTheme(object):
+    """Pens and brushes for one color and outline color."""
+    def __init__(self, color, outline_color):
+        self.color = QColor(color)
+        self.outline_color = QColor(outline_color)
+        self.brush = QBrush(self.color)
+        self.elapsed_color = QColor(self.color.red(), self.color.green(),
+                                    self.color.blue(), ELAPSED_ALPHA)
+        self._face_brushes = [None] * 256
+        self._outline_colors = [None] * 256
+        self._outline_pens = {}
+        self._pens = {}
+        self._arc_pens = {}
+
+    def face_brush(self, alpha):
+        """The face's fill at alpha: the color mixed with white, the more
+        so the more transparent the face is, so a faint face is close to
+        pure white."""
+        alpha = alpha_level(alpha)
+        brush = self._face_brushes[alpha]
+        if brush is None:
+            # white * A + color * (1 - A), with A = 1 - 0.07 * alpha / 255
+            tint = 7 * alpha
+            def mix(c):
+                return (255 * (25500 - tint) + c * tint) // 25500
+            brush = self._face_brushes[alpha] = QBrush(QColor(
+                mix(self.color.red()), mix(self.color.green()),
+                mix(self.color.blue()), alpha))
+        return brush
+
+    def outline_pen(self, alpha, width):
+        """The face's outline at alpha: halfway between half and fully
+        opaque."""
+        alpha = alpha_level(alpha)
+        key = (alpha, width_key(width))
+        pen = self._outline_pens.get(key)
+        if pen is None:
+            color = self._outline_colors[alpha]
+            if color is None:
+                color = self._outline_colors[alpha] = QColor(
+                    self.outline_color.red(), self.outline_color.green(),
+                    self.outline_color.blue(), (255 + alpha) // 2)
+            pen = self._outline_pens[key] = QPen(color, width)
+        return pen
+
+    def pen(self, width):
+        """A plain pen in the color, e.g. for a clock hand."""
+        key = width_key(width)
+        pen = self._pens.get(key)
+        if pen is None:
+            pen = self._pens[key] = QPen(self.color, width)
+        return pen
+
+    def arc_pens(self, thickness):
+        """The (remaining, elapsed) pens of the time elapsed arcs."""
+        key = width_key(thickness)
+        pens = self._arc_pens.get(key)
+        if pens is None:
+            pens = self._arc_pens[key] = (
+                QPen(self.color, thickness, Qt.SolidLine, Qt.FlatCap),
+                QPen(self.elapsed_color, thickness, Qt.SolidLine,
+                     Qt.FlatCap),
+                )
+        return pens
+
+
+class ThemeTable(object):
+    """One ClockTheme per (color, outline color) pair."""
+    def __init__(self):
+        self._themes = {}
+
+    def get(self, color, outline_color=Qt.black):
+        color = QColor(color)
+        outline_color = QColor(outline_color)
+        key = (color.rgba(), outline_color.rgba())
+        theme = self._themes.get(key)
+        if theme is None:
+            theme = self._themes[key] = ClockTheme(color, outline_color)
+        return theme
+
+    def hands(self, outline_color):
+        """The theme of clock hands, which are drawn in the outline color."""
+        return self.get(outline_color)
+
+    def palette(self, colors, outline_color):
+        """The themes for a list of hex colors sharing one hex outline
+        color, keyed by hex color, made up front along with the hands'
+        theme. Their pens and brushes are still made on first use."""
+        outline = to_color(outline_color)
+        self.hands(outline)
+        return dict((c, self.get(to_color(c), outline)) for c in colors)
+
+
+# The process-wide table.
+THEMES = ThemeTable()
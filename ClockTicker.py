@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+from PyQt5.QtCore import QObject, pyqtSignal, Qt, QTime, QTimer
+
+from TimingStats import timing
+
+# A wakeup this close to a second boundary counts as having reached it.
+TICK_SLACK_MS = 5
+
+
+class ClockTicker(QObject):
+    """A single tick source for everything on screen that follows the
+    wall clock.
+
+    One single-shot timer is re-armed for each wall-clock second
+    boundary, so every subscriber wakes up at the same moment and their
+    update() calls coalesce into one scene repaint. Subscribers connect
+    to the coarsest signal their visual state depends on: an hour hand
+    only needs minute_changed, not sixty ticks a minute.
+    """
+    second_changed = pyqtSignal(QTime)
+    minute_changed = pyqtSignal(QTime)
+
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """The ticker shared by every view in this process."""
+        if cls._shared is None:
+            cls._shared = ClockTicker()
+        return cls._shared
+
+    def __init__(self, parent=None):
+        super(ClockTicker, self).__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.handle_timeout)
+        self._due_ms = None
+        self._lateness = timing.wakeup("ClockTicker")
+        self._last_second = None
+        self._last_minute = None
+        self._started = False
+        self._owners = set()
+        self._visible_owners = set()
+
+    @property
+    def paused(self):
+        """True while every window that registered with set_visible() is
+        hidden, minimized or covered."""
+        return bool(self._owners) and not self._visible_owners
+
+    def start(self):
+        """Begin ticking. Calling this again while running is harmless."""
+        self._started = True
+        if not self.timer.isActive() and not self.paused:
+            self.handle_tick()
+
+    def stop(self):
+        self._started = False
+        self.timer.stop()
+
+    def set_visible(self, owner, visible):
+        """Tell the ticker whether owner (usually a window) can currently
+        be seen. Ticks stop while no owner is visible, and resume with an
+        immediate catch-up tick."""
+        was_paused = self.paused
+        self._owners.add(owner)
+        if visible:
+            self._visible_owners.add(owner)
+        else:
+            self._visible_owners.discard(owner)
+        if self.paused and not was_paused:
+            self.timer.stop()
+        elif was_paused and not self.paused and self._started:
+            self.handle_tick()
+
+    def handle_timeout(self):
+        late = QTime.currentTime().msecsSinceStartOfDay() - self._due_ms
+        if late < -12 * 60 * 60 * 1000:
+            late += 24 * 60 * 60 * 1000 # went past midnight
+        self._lateness.record(late)
+        self.handle_tick()
+
+    def handle_tick(self):
+        time = QTime.currentTime()
+        ms = time.msecsSinceStartOfDay()
+        second = (ms + TICK_SLACK_MS) // 1000
+        self._due_ms = (second + 1) * 1000
+        self.timer.start(self._due_ms - ms)
+        if second == self._last_second:
+            return
+        self._last_second = second
+        timing.mark_tick()
+        self.second_changed.emit(time)
+        minute = second // 60
+        if minute != self._last_minute:
+            self._last_minute = minute
+            self.minute_changed.emit(time)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""The line protocol spoken over the control socket of a running app.
+
+Each request and reply is one UTF-8 line:
+
+    start SECONDS   start a segment of SECONDS, at most a day -> ok
+    next            start the next segment in the rotation -> ok
+    finish          finish the current segment early -> ok
+    status          -> status running|stopped ELAPSED REMAINING
+    subscribe       -> ok, then one line per event until disconnect:
+                       begin / complete / tick ELAPSED REMAINING
+
+Anything that goes wrong is answered with "error MESSAGE". This module
+must stay free of Qt so the command-line client starts instantly.
+"""
+import os
+import tempfile
+
+
+def socket_path():
+    """Where the running app listens."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "pocketwatch.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), "pocketwatch-%d.sock" % uid)
+
+
+def format_times(seconds_elapsed, seconds_remaining):
+    return "%.3f %.3f" % (seconds_elapsed, seconds_remaining)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import math
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+from ControlProtocol import format_times, socket_path
+
+# The longest segment "start" accepts: a day.
+MAX_START_SECONDS = 24 * 60 * 60
+# How long to wait for another instance to answer on the socket.
+PROBE_TIMEOUT_MS = 500
+
+
+class ControlServer(QObject):
+    """Serves the control protocol (see ControlProtocol) on a Unix domain
+    socket. It runs on the Qt event loop: connections and requests arrive
+    as signals, nothing polls.
+
+    next_pomodoro is called for "next", the same way a click on the
+    overlay starts the next segment in the rotation.
+    """
+    def __init__(self, pomodoro_control, next_pomodoro=None, path=None,
+                 parent=None):
+        super(ControlServer, self).__init__(parent)
+        self.pomodoro_control = pomodoro_control
+        self.next_pomodoro = next_pomodoro
+        self.path = path or socket_path()
+        self.subscribers = []
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.handle_connection)
+        pomodoro_control.pomodoro_begin.connect(
+            lambda: self.publish("begin"))
+        pomodoro_control.pomodoro_complete.connect(
+            lambda: self.publish("complete"))
+        pomodoro_control.time_update.connect(
+            lambda e, r: self.publish("tick " + format_times(e, r)))
+
+    def listen(self):
+        """Start listening, replacing any socket a previous run left
+        behind. Returns False if that fails, or if another running
+        instance still answers on the socket."""
+        if self.in_use():
+            return False
+        QLocalServer.removeServer(self.path)
+        return self.server.listen(self.path)
+
+    def in_use(self):
+        """Whether something is accepting connections on the socket."""
+        probe = QLocalSocket()
+        probe.connectToServer(self.path)
+        connected = probe.waitForConnected(PROBE_TIMEOUT_MS)
+        probe.abort()
+        return connected
+
+    def close(self):
+        if self.server.isListening():
+            self.server.close()
+            QLocalServer.removeServer(self.path)
+
+    def handle_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(
+                lambda c=connection: self.handle_ready_read(c))
+            connection.disconnected.connect(
+                lambda c=connection: self.handle_disconnected(c))
+
+    def handle_disconnected(self, connection):
+        if connection in self.subscribers:
+            self.subscribers.remove(connection)
+        connection.deleteLater()
+
+    def handle_ready_read(self, connection):
+        while connection.canReadLine():
+            line = bytes(connection.readLine()).decode("utf-8", "replace")
+            reply = self.handle_request(connection, line.split())
+            connection.write((reply + "\n").encode("utf-8"))
+
+    def handle_request(self, connection, words):
+        if not words:
+            return "error empty request"
+        command, args = words[0], words[1:]
+        ctl = self.pomodoro_control
+        if command == "start" and len(args) == 1:
+            try:
+                seconds = float(args[0])
+            except ValueError:
+                return "error not a number of seconds: %s" % args[0]
+            if (math.isnan(seconds) or seconds <= 0 or
+                seconds > MAX_START_SECONDS):
+                return "error seconds out of range (0, %d]: %s" % (
+                    MAX_START_SECONDS, args[0])
+            ctl.start(seconds)
+        elif command == "next" and not args and self.next_pomodoro:
+            self.next_pomodoro()
+        elif command == "finish" and not args:
+            if ctl.is_running:
+                ctl.early_finish()
+        elif command == "status" and not args:
+            return "status %s %s" % (
+                "running" if ctl.is_running else "stopped",
+                format_times(ctl.seconds_elapsed, ctl.seconds_remaining))
+        elif command == "subscribe" and not args:
+            if connection not in self.subscribers:
+                self.subscribers.append(connection)
+        else:
+            return "error unknown request: %s" % " ".join(words)
+        return "ok"
+
+    def publish(self, line):
+        if not self.subscribers:
+            return
+        data = (line + "\n").encode("utf-8")
+        for connection in self.subscribers:
+            connection.write(data)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import math
+
+from PyQt5.QtCore import QObject, Qt, QTimer, QElapsedTimer
+
+from TimingStats import timing
+
+
+class FramePacer(QObject):
+    """Caps how often animated items repaint.
+
+    Items call request_update() instead of update(). Requests are
+    collected and flushed at most once per frame interval, so an
+    animation stepping at the animation timer's full rate only repaints
+    at max_fps. While the window is not exposed, requests are held and
+    flushed in one go when it comes back.
+
+    device_scale is the number of device pixels per scene unit; the view
+    keeps it current so items can skip changes smaller than a pixel.
+    """
+    def __init__(self, max_fps=30, parent=None):
+        super(FramePacer, self).__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.handle_timeout)
+        self.clock = QElapsedTimer()
+        self.clock.start()
+        self.device_scale = 1.
+        self.exposed = True
+        self._pending = []
+        self._last_frame = None
+        self._due_ms = None
+        self._lateness = timing.wakeup("FramePacer")
+        self.set_max_fps(max_fps)
+
+    def set_max_fps(self, max_fps):
+        """Limit repaints to max_fps frames per second; 0 means no limit."""
+        self.frame_ms = 1000. / max_fps if max_fps else 0.
+
+    def request_update(self, item):
+        if item not in self._pending:
+            self._pending.append(item)
+        if not self.exposed or self.timer.isActive():
+            return
+        wait = 0
+        if self._last_frame is not None:
+            wait = self.frame_ms - (self.clock.elapsed() - self._last_frame)
+        if wait <= 0:
+            self.flush()
+        else:
+            wait = int(math.ceil(wait))
+            self._due_ms = self.clock.elapsed() + wait
+            self.timer.start(wait)
+
+    def handle_timeout(self):
+        self._lateness.record(self.clock.elapsed() - self._due_ms)
+        self.flush()
+
+    def flush(self):
+        self._last_frame = self.clock.elapsed()
+        pending, self._pending = self._pending, []
+        for item in pending:
+            item.update()
+
+    def set_exposed(self, exposed):
+        self.exposed = exposed
+        if not exposed:
+            self.timer.stop()
+        elif self._pending:
+            self.flush()
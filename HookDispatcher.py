@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""User hooks for pomodoro events, run off the GUI thread.
+
+Hooks are listed in a JSON file, one object per hook:
+
+    [{"event": "complete", "command": "say 'Take a break'", "timeout": 5},
+     {"event": "begin", "url": "http://localhost:8080/pomodoro"}]
+
+"event" is "begin", "complete", "pause", or "*" for all of them. A hook
+either runs "command" (a shell command line, or an argv list for a
+script) with the event in $POCKETWATCH_EVENT, or POSTs the event as JSON
+to "url". "timeout" is in seconds; commands that overrun are killed.
+
+Hooks run on a small pool of worker threads fed by a bounded queue. An
+event that is already queued for a hook is not queued again, and when
+the queue is full new events are dropped and counted rather than making
+the GUI thread wait. Hooks that fail or overrun are counted and logged to
+telemetry.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+
+try:
+    import Queue as queue
+    from urllib2 import Request, urlopen
+except ImportError:
+    import queue
+    from urllib.request import Request, urlopen
+
+from Telemetry import telemetry, WARNING
+
+DEFAULT_TIMEOUT = 10.
+# How long close() waits for hooks that are already running.
+CLOSE_TIMEOUT = 1.
+EVENTS = ("begin", "complete", "pause")
+
+
+def load_hooks(path):
+    """The hooks listed in path, or none if it doesn't exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        hooks = json.load(f)
+    for hook in hooks:
+        if "command" not in hook and "url" not in hook:
+            raise ValueError("%s: hook needs a command or a url: %r"
+                             % (path, hook))
+    return hooks
+
+
+def wait_or_kill(process, timeout):
+    """Wait up to timeout seconds for process; kill it if it's still
+    running. Returns True if it finished in time."""
+    deadline = time.time() + timeout
+    while process.poll() is None:
+        if time.time() >= deadline:
+            process.kill()
+            process.wait()
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def run_hook(hook, payload):
+    """Run one hook for payload on the calling thread. Returns True if it
+    finished in time."""
+    timeout = hook.get("timeout", DEFAULT_TIMEOUT)
+    if "url" in hook:
+        request = Request(hook["url"], data=json.dumps(payload).encode("utf-8"),
+                          headers={"Content-Type": "application/json"})
+        urlopen(request, timeout=timeout).close()
+        return True
+    command = hook["command"]
+    env = dict(os.environ, POCKETWATCH_EVENT=payload["event"])
+    with open(os.devnull, "w") as devnull:
+        process = subprocess.Popen(command, shell=not isinstance(command, list),
+                                   env=env, stdout=devnull, stderr=devnull)
+        return wait_or_kill(process, timeout)
+
+
+class HookDispatcher(object):
+    """Queues hooks for events and runs them on worker threads.
+
+    dispatch() is called from the GUI thread and never blocks.
+    """
+    def __init__(self, hooks, workers=2, queue_size=32):
+        self.hooks = hooks
+        self.coalesced = 0
+        self.rejected = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.last_error = None
+        self._queue = queue.Queue(queue_size)
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers if hooks else 0):
+            thread = threading.Thread(target=self._work, name="hooks-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def attach(self, pomodoro_control, overlay=None):
+        """Dispatch hooks for pomodoro_control's begin and complete, and
+        for pause requests on overlay."""
+        pomodoro_control.pomodoro_begin.connect(
+            lambda: self.dispatch("begin", pomodoro_control))
+        pomodoro_control.pomodoro_complete.connect(
+            lambda: self.dispatch("complete", pomodoro_control))
+        if overlay is not None:
+            overlay.pomodoro_pause_requested.connect(
+                lambda: self.dispatch("pause", pomodoro_control))
+
+    def dispatch(self, event, pomodoro_control=None):
+        payload = {"event": event, "time": time.time()}
+        if pomodoro_control is not None:
+            payload["seconds_elapsed"] = pomodoro_control.seconds_elapsed
+            payload["seconds_remaining"] = pomodoro_control.seconds_remaining
+        for i, hook in enumerate(self.hooks):
+            if hook.get("event", "*") not in ("*", event):
+                continue
+            key = (i, event)
+            with self._lock:
+                if key in self._queued:
+                    self.coalesced += 1
+                    continue
+                try:
+                    self._queue.put_nowait((key, hook, payload))
+                except queue.Full:
+                    self.rejected += 1
+                    telemetry.record(WARNING, "hook_rejected", event, i)
+                    continue
+                self._queued.add(key)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            key, hook, payload = job
+            with self._lock:
+                self._queued.discard(key)
+            try:
+                if not run_hook(hook, payload):
+                    self.timed_out += 1
+                    telemetry.record(WARNING, "hook_timed_out",
+                                     payload["event"], key[0])
+            except Exception as e:
+                self.failed += 1
+                self.last_error = e
+                telemetry.record(WARNING, "hook_failed", payload["event"],
+                                 "%d %r" % (key[0], e))
+
+    def close(self):
+        """Drop the hooks still queued and stop the workers, waiting up to
+        CLOSE_TIMEOUT for hooks that are already running. Workers that
+        are still busy after that are daemons and die with the app."""
+        with self._lock:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queued.clear()
+            for thread in self._threads:
+                try:
+                    self._queue.put_nowait(None)
+                except queue.Full:
+                    break
+        deadline = time.time() + CLOSE_TIMEOUT
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.time()))
+        self._threads = []
@@ -1,22 +1,39 @@
 #/usr/bin/env python
 
-from PyQt5.QtCore import QPoint, Qt, QTime, QTimer
-from PyQt5.QtGui import QColor, QPainter, QPolygon, QPalette
+import math
+import sys
+import time
+
+from PyQt5.QtCore import (
+    QElapsedTimer, QPoint, QRectF, Qt, QTime, QTimer, pyqtSignal,
+    )
+from PyQt5.QtGui import QColor, QPainter, QPixmap, QPolygon, QPalette
 from PyQt5.QtWidgets import QApplication, QWidget, QToolBox, QGraphicsView, QDialog
 
-# import ctypes
-# from ctypes import CFUNCTYPE, c_void_p, c_char_p, c_int, c_long
-# import ctypes.util
-import ctypes, objc
-
-# Launch app in the background!
-import sys
-import AppKit
-info = AppKit.NSBundle.mainBundle().infoDictionary()
-info["LSBackgroundOnly"] = "1"
-info["LSUIElement"] = "1"
+import OverlayPlatform
+from Telemetry import telemetry, DEBUG
+from TimingStats import timing
 
 class OverlayGraphicsView(QGraphicsView):
+    """A frameless, translucent, always-on-top view.
+
+    Moving the window by hand goes through move_to() between
+    begin_move() and end_move(). Moves are coalesced to one per display
+    refresh, however fast the mouse reports, and while moving, paint
+    events the move causes are answered by blitting the last frame
+    instead of repainting the scene; only real scene changes, such as a
+    running animation, render it again.
+    """
+    # signal: milliseconds from launched_at until the first frame was painted
+    first_frame_painted = pyqtSignal(float)
+    # signal: milliseconds from the position moved to being requested
+    # until the move was made
+    window_moved = pyqtSignal(float)
+
+    # When the process started; the launcher should set this as early as
+    # it can. Defaults to when this module was imported.
+    launched_at = time.time()
+
     def __init__(self, parent=None):
         super(OverlayGraphicsView, self).__init__(parent)
         # Make this window an overlay.
@@ -29,43 +46,130 @@ class OverlayGraphicsView(QGraphicsView):
                            Qt.WindowStaysOnTopHint |
                            Qt.Dialog
         )
-        self.cocoawin = None
+        self.platform = None
+        self._painted = False
+
+        self.is_moving = False
+        self.move_clock = QElapsedTimer()
+        self.move_clock.start()
+        self.move_timer = QTimer(self)
+        self.move_timer.setSingleShot(True)
+        self.move_timer.setTimerType(Qt.PreciseTimer)
+        self.move_timer.timeout.connect(self.apply_move)
+        self._move_target = None
+        self._move_requested_at = None
+        self._last_move = None
+        self._frame = None
     def show(self):
         super(OverlayGraphicsView, self).show()
-
-        # Constants
-        NSWindowCollectionBehaviorFullScreenPrimary = 128
-        NSWindowCollectionBehaviorCanJoinAllSpaces = 1 << 0
-        NSWindowCollectionBehaviorMoveToActiveSpace = 1 << 1
-        NSWindowCollectionBehaviorTransient = 1 << 3
-        NSWindowCollectionBehaviorStationary = 1 << 4
-        NSWindowCollectionBehaviorFullScreenAuxiliary = 1 << 8
-
-        # Join all spaces (OSX-specific)
-        ctypes.pythonapi.PyCObject_AsVoidPtr.restype = ctypes.c_void_p
-        ctypes.pythonapi.PyCObject_AsVoidPtr.argtypes = [ctypes.py_object]
-        cocoawin = objc.objc_object(c_void_p=
-            ctypes.pythonapi.PyCObject_AsVoidPtr(
-                self.effectiveWinId().ascobject()))
-        cocoawin.window().setCollectionBehavior_(
-            NSWindowCollectionBehaviorFullScreenAuxiliary |
-            NSWindowCollectionBehaviorCanJoinAllSpaces |
-            NSWindowCollectionBehaviorStationary
-        )
-        self.cocoawin = cocoawin
+        # The platform backend (and whatever it imports) is only loaded
+        # once there is a window to apply it to.
+        if self.platform is None:
+            self.platform = OverlayPlatform.backend()
+        self.platform.join_all_spaces(self)
 
     def paintEvent(self, evt):
-        super(OverlayGraphicsView, self).paintEvent(evt)
+        start = time.time() if telemetry.enabled(DEBUG) else None
+        if self.is_moving:
+            self.paint_frame(evt)
+        else:
+            super(OverlayGraphicsView, self).paintEvent(evt)
+        if start is not None:
+            telemetry.record(DEBUG, "paint_ms", (time.time() - start) * 1000)
+        timing.frame_painted()
+        if not self._painted:
+            self._painted = True
+            self.first_frame_painted.emit(
+                (time.time() - self.launched_at) * 1000)
+
+    def paint_frame(self, evt):
+        """Paint the viewport from the last rendered frame, rendering the
+        scene again only if it changed since."""
+        if self._frame is None:
+            self._frame = self.render_frame()
+        painter = QPainter(self.viewport())
+        painter.setClipRegion(evt.region())
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawPixmap(0, 0, self._frame)
+        painter.end()
+
+    def render_frame(self):
+        viewport = self.viewport()
+        dpr = viewport.devicePixelRatioF()
+        frame = QPixmap(int(math.ceil(viewport.width() * dpr)),
+                        int(math.ceil(viewport.height() * dpr)))
+        frame.setDevicePixelRatio(dpr)
+        frame.fill(Qt.transparent)
+        painter = QPainter(frame)
+        painter.setRenderHints(self.renderHints())
+        self.render(painter, QRectF(viewport.rect()), viewport.rect())
+        painter.end()
+        return frame
+
+    def invalidate_frame(self, region=None):
+        self._frame = None
+
+    def refresh_ms(self):
+        """How long the screen we're on shows each frame."""
+        handle = self.windowHandle()
+        screen = handle.screen() if handle is not None else None
+        screen = screen or QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return 1000. / (rate if rate > 0 else 60)
+
+    def begin_move(self):
+        """Start moving the window by hand."""
+        if self.is_moving:
+            return
+        self.is_moving = True
+        self._frame = None
+        if self.scene() is not None:
+            self.scene().changed.connect(self.invalidate_frame)
+
+    def move_to(self, pos):
+        """Move the window's top left corner to pos, at most once per
+        display refresh; later calls in the same frame win."""
+        self._move_target = QPoint(pos)
+        self._move_requested_at = self.move_clock.nsecsElapsed()
+        if self.move_timer.isActive():
+            return
+        wait = 0
+        if self._last_move is not None:
+            wait = self.refresh_ms() - (self.move_clock.nsecsElapsed() -
+                                        self._last_move) / 1e6
+        if wait <= 0:
+            self.apply_move()
+        else:
+            self.move_timer.start(int(math.ceil(wait)))
+
+    def apply_move(self):
+        self.move_timer.stop()
+        if self._move_target is None:
+            return
+        self.move(self._move_target)
+        self._move_target = None
+        self._last_move = self.move_clock.nsecsElapsed()
+        latency = (self._last_move - self._move_requested_at) / 1e6
+        telemetry.record(DEBUG, "move_latency_ms", latency)
+        self.window_moved.emit(latency)
+
+    def end_move(self):
+        """Stop moving the window, making any move still pending."""
+        self.apply_move()
+        if not self.is_moving:
+            return
+        self.is_moving = False
+        self._frame = None
+        if self.scene() is not None:
+            self.scene().changed.disconnect(self.invalidate_frame)
 
     def setOSXDropShadow(self, has_shadow):
-        if self.cocoawin:
-            self.cocoawin.window().setHasShadow_(has_shadow)
+        if self.platform:
+            self.platform.set_drop_shadow(self, has_shadow)
 
     def resetShadow(self, evt):
-        if self.cocoawin:
-            self.cocoawin.window().invalidateShadow()
-        #self.cocoawin.window().setHasShadow_(False)
-        #self.cocoawin.window().setHasShadow_(True)
+        if self.platform:
+            self.platform.invalidate_shadow(self)
 
     def drawBackground(self, painter, rect):
         """WORKAROUND: Since this widget has a transparent background, Qt's
@@ -81,6 +185,7 @@ class OverlayGraphicsView(QGraphicsView):
 
 if __name__=="__main__":
     from PyQt5.QtWidgets import QApplication
+    OverlayPlatform.launch_in_background()
     app = QApplication(sys.argv)
 
     overlay = OverlayGraphicsView()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""Platform-specific tweaks for overlay windows: joining every
+space/desktop, the drop shadow, and launching without a dock icon.
+
+Nothing platform-specific is imported until a backend is first asked
+for, which OverlayGraphicsView does on its first show(). Platforms
+without a backend of their own get NullBackend, which does nothing.
+"""
+import sys
+
+
+class NullBackend(object):
+    """Leaves windows exactly as Qt made them."""
+    name = "null"
+    def launch_in_background(self):
+        pass
+    def join_all_spaces(self, widget):
+        pass
+    def set_drop_shadow(self, widget, has_shadow):
+        pass
+    def invalidate_shadow(self, widget):
+        pass
+
+
+class MacBackend(NullBackend):
+    """Talks to the window's NSWindow through pyobjc."""
+    name = "cocoa"
+
+    # NSWindowCollectionBehavior
+    CanJoinAllSpaces = 1 << 0
+    MoveToActiveSpace = 1 << 1
+    Transient = 1 << 3
+    Stationary = 1 << 4
+    FullScreenAuxiliary = 1 << 8
+
+    def __init__(self):
+        import ctypes, objc, AppKit
+        self.ctypes = ctypes
+        self.objc = objc
+        self.AppKit = AppKit
+        ctypes.pythonapi.PyCObject_AsVoidPtr.restype = ctypes.c_void_p
+        ctypes.pythonapi.PyCObject_AsVoidPtr.argtypes = [ctypes.py_object]
+        self._windows = {}
+
+    def launch_in_background(self):
+        info = self.AppKit.NSBundle.mainBundle().infoDictionary()
+        info["LSBackgroundOnly"] = "1"
+        info["LSUIElement"] = "1"
+
+    def window(self, widget):
+        """The NSWindow behind widget. It must already be shown."""
+        key = int(widget.effectiveWinId())
+        if key not in self._windows:
+            view = self.objc.objc_object(c_void_p=
+                self.ctypes.pythonapi.PyCObject_AsVoidPtr(
+                    widget.effectiveWinId().ascobject()))
+            self._windows[key] = view.window()
+        return self._windows[key]
+
+    def join_all_spaces(self, widget):
+        self.window(widget).setCollectionBehavior_(
+            self.FullScreenAuxiliary |
+            self.CanJoinAllSpaces |
+            self.Stationary
+        )
+
+    def set_drop_shadow(self, widget, has_shadow):
+        self.window(widget).setHasShadow_(has_shadow)
+
+    def invalidate_shadow(self, widget):
+        self.window(widget).invalidateShadow()
+
+
+class X11Backend(NullBackend):
+    """Asks an EWMH window manager to show the window on every desktop.
+    Uses python-xlib when it is installed and can reach the display, and
+    does nothing otherwise; shadows are up to the compositor."""
+    name = "x11"
+    ALL_DESKTOPS = 0xFFFFFFFF
+
+    def __init__(self):
+        self.display = None
+        try:
+            from Xlib import X, display, error
+            from Xlib.protocol import event
+        except ImportError:
+            return
+        self.X = X
+        self.event = event
+        try:
+            self.display = display.Display()
+        except (error.DisplayError, error.ConnectionClosedError,
+                EnvironmentError):
+            # No DISPLAY, or the X server turned us away.
+            pass
+
+    def join_all_spaces(self, widget):
+        if self.display is None:
+            return
+        d = self.display
+        atom = d.intern_atom("_NET_WM_DESKTOP")
+        root = d.screen().root
+        window = d.create_resource_object("window", int(widget.winId()))
+        message = self.event.ClientMessage(
+            window=window, client_type=atom,
+            data=(32, [self.ALL_DESKTOPS, 1, 0, 0, 0]))
+        root.send_event(message, event_mask=(
+            self.X.SubstructureRedirectMask | self.X.SubstructureNotifyMask))
+        d.flush()
+
+
+_backend = None
+
+def backend():
+    """The backend for this platform, created on first use."""
+    global _backend
+    if _backend is None:
+        _backend = _make_backend()
+    return _backend
+
+def _make_backend():
+    try:
+        if sys.platform == "darwin":
+            return MacBackend()
+        from PyQt5.QtGui import QGuiApplication
+        if QGuiApplication.platformName() == "xcb":
+            return X11Backend()
+    except ImportError:
+        pass
+    return NullBackend()
+
+def launch_in_background():
+    """Keep the app out of the dock and app switcher where the platform
+    has such a thing. Call this before creating the QApplication."""
+    if sys.platform == "darwin":
+        backend().launch_in_background()
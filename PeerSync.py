@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+import json
+import math
+import numbers
+import time
+import uuid
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtNetwork import QAbstractSocket, QHostAddress, QUdpSocket
+
+MULTICAST_GROUP = "239.255.42.99"
+PORT = 45999
+VERSION = 1
+# The longest segment a peer may announce: a day.
+MAX_PLANNED_SECONDS = 24 * 60 * 60
+EVENTS = ("begin", "complete")
+
+
+def is_finite(value):
+    return (isinstance(value, numbers.Real) and not isinstance(value, bool)
+            and not math.isinf(value) and not math.isnan(value))
+
+
+def is_index(value, count):
+    """Whether value is -1 (nothing picked yet) or an index below count."""
+    return (isinstance(value, numbers.Integral) and
+            not isinstance(value, bool) and -1 <= value < count)
+
+
+class PeerSync(QObject):
+    """Keeps several instances on the same pomodoro over UDP multicast.
+
+    Only state transitions are sent: a begin carries the segment's
+    planned length and absolute wall-clock deadline, a complete carries
+    nothing more, and each peer runs its own countdown towards the
+    shared deadline. Traffic is therefore per event, never per tick.
+
+    Every event is stamped with a Lamport clock and the sender's node
+    id; a peer applies an event only if (clock, node) is newer than the
+    last one it applied, so peers agree on the last writer without a
+    central server. A peer that starts up says hello, and peers answer
+    by re-sending the last event they applied.
+
+    Deadlines are wall-clock times, so the machines' clocks should be
+    kept in sync (NTP is plenty for a once-a-second display).
+
+    Construct this before the color rotation is connected to the
+    control: events carry the rotation indexes at the moment they are
+    sent, and receivers set theirs to match before applying the event.
+    """
+    def __init__(self, pomodoro_control, rotation, group=MULTICAST_GROUP,
+                 port=PORT, parent=None):
+        super(PeerSync, self).__init__(parent)
+        self.pomodoro_control = pomodoro_control
+        self.rotation = rotation
+        self.group = QHostAddress(group)
+        self.port = port
+        self.node = uuid.uuid4().hex
+        self.clock = 0
+        self.last_applied = None   # (clock, node) of the newest event
+        self.last_event = None
+        self._applying = False
+        self.socket = QUdpSocket(self)
+        self.socket.readyRead.connect(self.handle_ready_read)
+        pomodoro_control.pomodoro_begin.connect(self.handle_begin)
+        pomodoro_control.pomodoro_complete.connect(self.handle_complete)
+
+    def join(self):
+        """Start listening to peers and ask them for their state. Returns
+        False if the multicast socket can't be set up."""
+        if not self.socket.bind(QHostAddress(QHostAddress.AnyIPv4), self.port,
+                                QUdpSocket.ShareAddress |
+                                QUdpSocket.ReuseAddressHint):
+            return False
+        self.socket.setSocketOption(QAbstractSocket.MulticastTtlOption, 1)
+        if not self.socket.joinMulticastGroup(self.group):
+            return False
+        self.send({"event": "hello"})
+        return True
+
+    def send(self, message):
+        message["v"] = VERSION
+        message.setdefault("node", self.node)
+        self.socket.writeDatagram(json.dumps(message).encode("utf-8"),
+                                  self.group, self.port)
+
+    def local_event(self, event, **fields):
+        if self._applying:
+            return
+        self.clock += 1
+        message = dict(fields, event=event, clock=self.clock, node=self.node,
+                       segment=self.rotation.segment_index,
+                       color=self.rotation.color_index)
+        self.last_applied = (self.clock, self.node)
+        self.last_event = message
+        self.send(message)
+
+    def handle_begin(self):
+        ctl = self.pomodoro_control
+        self.local_event("begin",
+                         planned=ctl.seconds_elapsed + ctl.seconds_remaining,
+                         deadline=time.time() + ctl.seconds_remaining)
+
+    def handle_complete(self):
+        self.local_event("complete")
+
+    def handle_ready_read(self):
+        while self.socket.hasPendingDatagrams():
+            data, host, port = self.socket.readDatagram(
+                self.socket.pendingDatagramSize())
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except ValueError:
+                continue
+            if (not isinstance(message, dict) or
+                message.get("v") != VERSION or
+                message.get("node") == self.node):
+                continue
+            self.handle_message(message)
+
+    def valid_event(self, message):
+        """Whether message is a begin or complete we can apply: anyone on
+        the network can send us datagrams, so nothing in them is taken on
+        trust."""
+        if message.get("event") not in EVENTS:
+            return False
+        clock = message.get("clock")
+        if (not isinstance(clock, numbers.Integral) or
+            isinstance(clock, bool) or clock < 0 or
+            not isinstance(message.get("node"), type(u""))):
+            return False
+        if not (is_index(message.get("segment"), len(self.rotation.timeline))
+                and is_index(message.get("color"), len(self.rotation.colors))):
+            return False
+        if message["event"] == "begin":
+            planned = message.get("planned")
+            if (not is_finite(message.get("deadline")) or
+                not is_finite(planned) or
+                not 0 < planned <= MAX_PLANNED_SECONDS):
+                return False
+        return True
+
+    def handle_message(self, message):
+        if message.get("event") == "hello":
+            if self.last_event is not None:
+                self.send(dict(self.last_event))
+            return
+        if not self.valid_event(message):
+            return
+        stamp = (message["clock"], message["node"])
+        self.clock = max(self.clock, stamp[0])
+        if self.last_applied is not None and stamp <= self.last_applied:
+            return
+        self.last_applied = stamp
+        self.last_event = message
+        self._applying = True
+        try:
+            self.apply(message)
+        finally:
+            self._applying = False
+
+    def apply(self, message):
+        ctl = self.pomodoro_control
+        self.rotation.segment_index = message["segment"]
+        self.rotation.color_index = message["color"]
+        if message["event"] == "begin":
+            remaining = message["deadline"] - time.time()
+            if 0 < remaining <= message["planned"]:
+                ctl.resume(message["planned"], remaining)
+        elif message["event"] == "complete":
+            if ctl.is_running:
+                # The color rotation moves on with the complete.
+                ctl.early_finish()
+            else:
+                # Our own countdown already ran out and moved the color
+                # on; just land where the peer's complete moved its to,
+                # without completing a second time.
+                self.rotation.next_color()
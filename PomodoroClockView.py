@@ -1,26 +1,48 @@
 #/usr/bin/env python
 import math
 from PyQt5.QtCore import (
-    QEasingCurve,
+    QEasingCurve, QEvent,
     QPoint, Qt, QTime, QTimer, QPropertyAnimation, QRect, QRectF, QPointF,
     QState, QStateMachine,
     pyqtSignal, pyqtProperty,
     )
-from PyQt5.QtGui import QColor, QPainter, QPolygon, QPen, QBrush, QPalette
+from PyQt5.QtGui import QColor, QFont, QPainter, QPolygon, QPen, QBrush, QPalette
 from PyQt5.QtWidgets import QApplication, QWidget, QToolBox, QGraphicsView, QDialog, QGraphicsEllipseItem, QGraphicsScene, QGraphicsObject, QGraphicsDropShadowEffect
 
 from OverlayGraphicsView import OverlayGraphicsView
+from ClockTicker import ClockTicker
+from FramePacer import FramePacer
+from ClockTheme import THEMES
+from RenderCache import draw_cached_layer
+from Telemetry import telemetry, DEBUG
+from TimingStats import timing
 
 class QColorThemedGraphicsObject(QGraphicsObject):
     """
     For all our graphics objects that need a color.
+    Paint methods take their pens and brushes from theme(), which is
+    looked up once per color change rather than built on every paint.
     """
+    _theme = None
+    _outline_color = QColor(0, 0, 0)
     def get_color(self):
         return self._color
     def set_color(self,c):
         self._color = c
+        self._theme = None
         self.update()
     color = pyqtProperty(QColor, get_color, set_color)
+    def set_theme(self, theme):
+        """Paint with a ClockTheme that is already built, taking its color
+        and outline color."""
+        self._color = theme.color
+        self._outline_color = theme.outline_color
+        self._theme = theme
+        self.update()
+    def theme(self):
+        if self._theme is None:
+            self._theme = THEMES.get(self._color, self._outline_color)
+        return self._theme
 
 
 class ClockHandShape(QColorThemedGraphicsObject):
@@ -36,12 +58,12 @@ class ClockHandShape(QColorThemedGraphicsObject):
         self._color = QColor(0, 0, 0)
     def paint(self, painter, option, widget):
         #print(self.transformOrigin())
+        theme = self.theme()
         painter.setBrush(Qt.NoBrush)
-        painter.setPen(QPen(self._color,
-                            self._width))
-        painter.drawLine(0, self._sz*0.1,  0, -self._sz)
+        painter.setPen(theme.pen(self._width))
+        painter.drawLine(QPointF(0, self._sz*0.1), QPointF(0, -self._sz))
         W = self._width
-        painter.setBrush(self._color)
+        painter.setBrush(theme.brush)
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(QRectF(-1.*W, -1.*W, 2.*W, 2.*W))
     def boundingRect(self):
@@ -51,16 +73,20 @@ class ClockHandShape(QColorThemedGraphicsObject):
 class SynchronizedClockHand(ClockHandShape):
     """
     This is a clock hand that automatically moves in time!
+    It only listens to the ticks that can change its angle: the hour
+    hand moves once a minute, the others once a second.
     """
     def __init__(self, mode, *args, **kw):
+        ticker = kw.pop("ticker", None) or ClockTicker.shared()
         super(SynchronizedClockHand,self).__init__(*args, **kw)
         self.mode = mode
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.handle_time_update)
-        self.timer.start(1000)
-        self.handle_time_update()
-    def handle_time_update(self):
-        time = QTime.currentTime()
+        if self.mode == "hour":
+            ticker.minute_changed.connect(self.handle_time_update)
+        else:
+            ticker.second_changed.connect(self.handle_time_update)
+        ticker.start()
+        self.handle_time_update(QTime.currentTime())
+    def handle_time_update(self, time):
         if self.mode == "hour":
             self.setRotation(time.hour() * 360. / 12.
                              + time.minute() * 360. / (60*12))
@@ -90,6 +116,7 @@ class ClockBack(QColorThemedGraphicsObject):
 
     def set_outline_color(self, outline_color):
         self._outline_color = outline_color
+        self._theme = None
 
     def __init__(self, size, *args, **kw):
         super(ClockBack,self).__init__(*args, **kw)
@@ -101,22 +128,24 @@ class ClockBack(QColorThemedGraphicsObject):
         self._line_width = 3
 
     def paint(self, painter, option, widget):
+        # The face only changes with the theme, alpha, line width or size,
+        # so normal ticks repaint it with a single blit.
+        draw_cached_layer(painter, self.boundingRect(), self.cache_key(),
+                          self.paint_face)
+
+    def cache_key(self):
+        """Everything the face's appearance depends on, short of the
+        device it's drawn on."""
+        return ("ClockBack", self._color.rgba(), self._outline_color.rgba(),
+                self._alpha, self._line_width, self.size)
+
+    def paint_face(self, painter):
         # Draw background
-        painter.setPen(QPen(QColor(self._outline_color.red(),
-                                   self._outline_color.green(),
-                                   self._outline_color.blue(),
-                                   0.5*255 + 0.5*self._alpha
-        ), self._line_width))
-        # How much white to mix in?
-        # At low alpha, I want the background to be super close to
-        # pure white.
-        A=(1 - 0.07*(self._alpha/255.))
-        B=1-A
-        painter.setBrush(QColor(255*A+B*self._color.red(),
-                                255*A+B*self._color.green(),
-                                255*A+B*self._color.blue(),
-                                self._alpha
-        ))
+        # At low alpha, the fill is super close to pure white; the theme
+        # works out how much white to mix in.
+        theme = self.theme()
+        painter.setPen(theme.outline_pen(self._alpha, self._line_width))
+        painter.setBrush(theme.face_brush(self._alpha))
         center = self.size/2
         painter.drawEllipse(self.bbox)
         ## Draw four ticks along the sides
@@ -148,8 +177,14 @@ class TimeElapsedView(QColorThemedGraphicsObject):
     ending time should be less than 60 minutes after starting time,
     and the current time should also be less than 60 minutes after
     starting.
+
+    Only the "now" edge, where the remaining arc meets the elapsed arc,
+    moves while a segment runs: the other two ends sit at the start time
+    and the deadline. So the view only repaints once that edge has moved
+    a whole device pixel, and only the small region around it.
     """
-    def __init__(self, sz, thickness, pomodoro_control, parent=None):
+    def __init__(self, sz, thickness, pomodoro_control, parent=None,
+                 ticker=None):
         super(TimeElapsedView, self).__init__(parent)
         self._sz = sz
         self._thickness = thickness
@@ -157,21 +192,82 @@ class TimeElapsedView(QColorThemedGraphicsObject):
 
         self._seconds_elapsed = 0
         self._seconds_remaining = 0
+        self._updated_at = None
+        self._painted_second = None
+        self._painted_time = None
 
         # Recieve view updates from the Pomodoro Controller, horray~~
         self.pomodoro_control = pomodoro_control
         self.pomodoro_control.time_update.connect(self.update_time)
 
-        # Must periodically repaint everything!
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(1000)
+        # The "now" edge follows the wall clock, so repaint on the shared
+        # tick rather than on a timer of our own.
+        ticker = ticker or ClockTicker.shared()
+        ticker.second_changed.connect(self.handle_tick)
+        ticker.start()
 
     def update_time(self, seconds_elapsed, seconds_remaining):
         self._seconds_elapsed = seconds_elapsed
         self._seconds_remaining = seconds_remaining
-        print "time update: %d, %d"%(seconds_elapsed, seconds_remaining)
-        self.update() # schedule repaint
+        self._updated_at = QTime.currentTime()
+        telemetry.record(DEBUG, "tick", seconds_elapsed, seconds_remaining)
+        # Mid-segment updates are drawn on the next wall-clock tick; only
+        # the jumps at the start and end of a segment need a repaint now.
+        if seconds_elapsed == 0 or seconds_remaining == 0:
+            self.update()
+
+    def handle_tick(self, time):
+        second = (time.msecsSinceStartOfDay() + 500) // 1000
+        if self._painted_second is not None:
+            since = (second - self._painted_second) % (24 * 60 * 60)
+            if since < self.repaint_interval():
+                return
+            self.update(self.now_edge_rect(self._painted_time)
+                        .united(self.now_edge_rect(time)))
+        else:
+            self.update()
+        self._painted_second = second
+        self._painted_time = time
+
+    def device_scale(self):
+        """Device pixels per item unit in the first view showing us."""
+        views = self.scene().views() if self.scene() else []
+        if not views:
+            return 1.
+        return views[0].transform().m11() * views[0].devicePixelRatioF()
+
+    def arc_radius(self):
+        return self._sz / 2. - 0.5*self._thickness
+
+    def repaint_interval(self):
+        """Whole seconds it takes the now edge to move one device pixel
+        along the arc, which turns once an hour."""
+        pixels_per_second = (2 * math.pi * self.arc_radius() *
+                             self.device_scale() / (60 * 60))
+        return max(1, int(math.ceil(1. / pixels_per_second)))
+
+    def now_edge_rect(self, time):
+        """The region the now edge covers at the given time."""
+        minute = time.minute() + time.second() / 60.
+        angle = math.radians(90 - 360 * minute / 60.)
+        r = self.arc_radius()
+        x = self._sz / 2. + r * math.cos(angle)
+        y = self._sz / 2. - r * math.sin(angle)
+        half = 0.5*self._thickness + 1
+        return QRectF(x - half, y - half, 2*half, 2*half)
+
+    def current_times(self, time):
+        """Seconds elapsed and remaining as of time. While the segment
+        runs they are carried forward from the last update, so the arc's
+        start and deadline ends stay put between updates."""
+        elapsed, remaining = self._seconds_elapsed, self._seconds_remaining
+        if self._updated_at is None or not self.pomodoro_control.is_running:
+            return elapsed, remaining
+        ms = self._updated_at.msecsTo(time)
+        if ms < -12 * 60 * 60 * 1000:
+            ms += 24 * 60 * 60 * 1000 # went past midnight
+        drift = min(max(0, ms) / 1000., remaining)
+        return elapsed + drift, remaining - drift
 
     def boundingRect(self):
         return QRectF(-self._thickness,
@@ -181,58 +277,56 @@ class TimeElapsedView(QColorThemedGraphicsObject):
 
     def paint(self, painter, option, widget):
         time = QTime.currentTime()
+        seconds_elapsed, seconds_remaining = self.current_times(time)
+        # Time left in the color, elapsed time faded out.
+        remaining_pen, elapsed_pen = self.theme().arc_pens(self._thickness)
+        self.paint_arcs(painter, QRectF(0, 0, self._sz, self._sz),
+                        self._thickness, remaining_pen, elapsed_pen,
+                        time, seconds_elapsed, seconds_remaining)
+
+    @staticmethod
+    def paint_arcs(painter, rect, thickness, remaining_pen, elapsed_pen,
+                   time, seconds_elapsed, seconds_remaining):
+        """Draw the remaining and elapsed arcs of a clock filling rect,
+        both starting from the minute hand's position at time."""
         minuteNow = time.minute() + (time.second() / 60.0)
-
-        angleSecondsElapsed = 16*(360*self._seconds_elapsed / 60. / 60.)
-        angleSecondsRemaining = 16*(360*self._seconds_remaining / 60. / 60.)
+        angleSecondsElapsed = 16*(360*seconds_elapsed / 60. / 60.)
+        angleSecondsRemaining = 16*(360*seconds_remaining / 60. / 60.)
         thetaNow = 16*(90 - 360 * minuteNow / 60.)
-        PADDING = 0.5*self._thickness
-
-        # Time left
-        painter.setPen(QPen(QColor(self._color.red(),
-                                   self._color.green(),
-                                   self._color.blue(),
-                                   255),
-                            self._thickness,
-                            Qt.SolidLine,
-                            #Qt.FlatCap if abs(theta3-thetaNow) < 16*20 else Qt.RoundCap,
-                            Qt.FlatCap
-                            #Qt.RoundCap
-        ))
+        PADDING = 0.5*thickness
+        arc = rect.adjusted(PADDING, PADDING, -PADDING, -PADDING)
+
         painter.setBrush(Qt.NoBrush)
-        painter.drawArc(PADDING, PADDING,
-                        self._sz-2*PADDING, self._sz-2*PADDING,
-                        thetaNow, -angleSecondsRemaining)
-        # Elapsed time
-        painter.setPen(QPen(QColor(self._color.red(),
-                                   self._color.green(),
-                                   self._color.blue(),
-                                   64),
-                            self._thickness,
-                            Qt.SolidLine,
-                            Qt.FlatCap,
-        ))
-        painter.drawArc(PADDING, PADDING,
-                        self._sz-2*PADDING, self._sz-2*PADDING,
-                        thetaNow, angleSecondsElapsed)
+        painter.setPen(remaining_pen)
+        painter.drawArc(arc, int(thetaNow), int(-angleSecondsRemaining))
+        painter.setPen(elapsed_pen)
+        painter.drawArc(arc, int(thetaNow), int(angleSecondsElapsed))
 
 
 
 class CircleObstruction(QColorThemedGraphicsObject):
     """
     Useful for notifications, I...guess?
+    If given a FramePacer, animation steps repaint at most at its frame
+    rate, and steps that move the edge by less than a device pixel are
+    skipped altogether.
     """
     def get_thickness(self):
         return self._thickness
     def set_thickness(self,c):
         self._thickness = c
-        self.update()
+        if self.pacer is None:
+            self.update()
+        elif abs(c - self._painted_thickness) * self.pacer.device_scale >= 1:
+            self.pacer.request_update(self)
     thickness = pyqtProperty(float, get_thickness, set_thickness)
-    def __init__(self, sz, thickness, parent=None):
+    def __init__(self, sz, thickness, parent=None, pacer=None):
         super(CircleObstruction, self).__init__(parent)
         self._sz = sz
         self._thickness = thickness
+        self._painted_thickness = thickness
         self._color = Qt.blue
+        self.pacer = pacer
     def boundingRect(self):
         return QRectF(-self._thickness,
                       -self._thickness,
@@ -240,9 +334,10 @@ class CircleObstruction(QColorThemedGraphicsObject):
                       self._sz + 2*self._thickness)
 
     def paint(self, painter, option, widget):
+        self._painted_thickness = self._thickness
         # painter.setPen(QPen(self._color,
         #                     self._thickness))
-        painter.setBrush(self._color)
+        painter.setBrush(self.theme().brush)
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(QRectF(
             self._sz/2.0 - self._thickness,
@@ -256,6 +351,7 @@ class CircleObstruction(QColorThemedGraphicsObject):
         self.anim.setStartValue(self.get_thickness())
         self.anim.setEndValue(50.0)
         self.anim.setEasingCurve(QEasingCurve.OutElastic)
+        self.anim.finished.connect(self.update)
         self.anim.start()
     def hide_anim(self):
         self.anim = QPropertyAnimation(self, "thickness")
@@ -263,6 +359,7 @@ class CircleObstruction(QColorThemedGraphicsObject):
         self.anim.setStartValue(self.get_thickness())
         self.anim.setEndValue(0.0)
         self.anim.setEasingCurve(QEasingCurve.InBack)
+        self.anim.finished.connect(self.update)
         self.anim.start()
 
 
@@ -273,18 +370,23 @@ class PomodoroClockView(OverlayGraphicsView, QColorThemedGraphicsObject):
     pomodoro_pause_requested = pyqtSignal()
 
     def set_color(self, color, outline_color):
-        super(PomodoroClockView, self).set_color(color)
-        self.hour_hand.set_color(outline_color)
-        self.minute_hand.set_color(outline_color)
-        self.clock_back.set_color(self._color)
-        self.clock_back.set_outline_color(outline_color)
-        self.time_elapsed_view.set_color(self._color)
-        self.obstruction.set_color(self._color)
+        # The parts share the themes from THEMES, so a color the app
+        # built up front is only looked up here, never built.
+        theme = THEMES.get(color, outline_color)
+        hands_theme = THEMES.hands(outline_color)
+        self.set_theme(theme)
+        self.hour_hand.set_theme(hands_theme)
+        self.minute_hand.set_theme(hands_theme)
+        self.clock_back.set_theme(theme)
+        self.time_elapsed_view.set_theme(theme)
+        self.obstruction.set_theme(theme)
 
     def __init__(self, pomodoro_control, parent=None):
         super(PomodoroClockView, self).__init__(parent)
         self.dragPosition = None
         self.pomodoro_control = pomodoro_control
+        self._watching_exposure = False
+        self.timing_overlay = False
 
         # Hide scrollbars
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
@@ -295,11 +397,18 @@ class PomodoroClockView(OverlayGraphicsView, QColorThemedGraphicsObject):
         # A scene containing all the parts of the clock
         scene = QGraphicsScene()
         self.setScene(scene)
+        # Every moving part wakes up on the same shared tick.
+        self.ticker = ClockTicker.shared()
         self.clock_back = ClockBack(100)
-        self.hour_hand = SynchronizedClockHand("hour", 50, 50, 37*0.66, 2.3)
-        self.minute_hand = SynchronizedClockHand("minute", 50, 50, 37, 2)
-        self.time_elapsed_view = TimeElapsedView(100, 15, self.pomodoro_control)
-        self.obstruction = CircleObstruction(100, 0)
+        self.hour_hand = SynchronizedClockHand("hour", 50, 50, 37*0.66, 2.3,
+                                               ticker=self.ticker)
+        self.minute_hand = SynchronizedClockHand("minute", 50, 50, 37, 2,
+                                                 ticker=self.ticker)
+        self.time_elapsed_view = TimeElapsedView(100, 15, self.pomodoro_control,
+                                                 ticker=self.ticker)
+        # Animations repaint through the pacer, capped at its frame rate.
+        self.frame_pacer = FramePacer()
+        self.obstruction = CircleObstruction(100, 0, pacer=self.frame_pacer)
         scene.addItem(self.clock_back)
         scene.addItem(self.hour_hand)
         scene.addItem(self.minute_hand)
@@ -382,10 +491,93 @@ class PomodoroClockView(OverlayGraphicsView, QColorThemedGraphicsObject):
         # Transformation: let's let (50, 50) be the center and range from [0,100].
         self.fitInView(QRectF(-10, -10, 120, 120))
         self.setSceneRect(QRectF(0, 0, 100, 100))
+        self.frame_pacer.device_scale = (self.transform().m11() *
+                                         self.devicePixelRatioF())
+
+    def set_max_fps(self, max_fps):
+        """Cap the frame rate of animations; 0 means uncapped."""
+        self.frame_pacer.set_max_fps(max_fps)
+
+    def set_timing_overlay(self, shown):
+        """Show or hide the timer lateness and tick-to-paint histograms
+        over the clock. While shown, the whole view repaints every tick
+        to keep them current."""
+        if shown == self.timing_overlay:
+            return
+        self.timing_overlay = shown
+        if shown:
+            self.ticker.second_changed.connect(self.refresh_timing_overlay)
+        else:
+            self.ticker.second_changed.disconnect(self.refresh_timing_overlay)
+        self.viewport().update()
+
+    def refresh_timing_overlay(self, time):
+        self.viewport().update()
+
+    def drawForeground(self, painter, rect):
+        if not self.timing_overlay:
+            return
+        painter.save()
+        painter.resetTransform()
+        font = QFont()
+        font.setPixelSize(8)
+        painter.setFont(font)
+        lines = timing.summary()
+        height = painter.fontMetrics().height()
+        descent = painter.fontMetrics().descent()
+        painter.fillRect(0, 0, self.viewport().width(), height * len(lines),
+                         QColor(255, 255, 255, 200))
+        painter.setPen(QColor(0, 0, 0))
+        for i, line in enumerate(lines):
+            painter.drawText(2, height * (i + 1) - descent, line)
+        painter.restore()
+
+    def keyPressEvent(self, evt):
+        # T toggles the timing overlay.
+        if evt.key() == Qt.Key_T:
+            self.set_timing_overlay(not self.timing_overlay)
+            evt.accept()
+        else:
+            super(PomodoroClockView, self).keyPressEvent(evt)
+
+    def show(self):
+        super(PomodoroClockView, self).show()
+        # Only the QWindow hears about being covered, so listen in on it.
+        handle = self.windowHandle()
+        if handle is not None and not self._watching_exposure:
+            handle.installEventFilter(self)
+            self._watching_exposure = True
+        self.update_exposure()
+
+    def hideEvent(self, evt):
+        super(PomodoroClockView, self).hideEvent(evt)
+        self.update_exposure()
+
+    def changeEvent(self, evt):
+        super(PomodoroClockView, self).changeEvent(evt)
+        if evt.type() == QEvent.WindowStateChange:
+            self.update_exposure()
+
+    def eventFilter(self, obj, evt):
+        if obj is self.windowHandle() and evt.type() == QEvent.Expose:
+            self.update_exposure()
+        return super(PomodoroClockView, self).eventFilter(obj, evt)
+
+    def update_exposure(self):
+        """Pause ticks and animation repaints while nothing of the window
+        can be seen; both catch up as soon as it is exposed again."""
+        handle = self.windowHandle()
+        exposed = (self.isVisible() and not self.isMinimized() and
+                   (handle is None or handle.isExposed()))
+        self.ticker.set_visible(self, exposed)
+        self.frame_pacer.set_exposed(exposed)
 
     def mousePressEvent(self, evt):
         """
         Users can move the clock by dragging it aruond.
+        The window follows the mouse once per display refresh, however
+        often the mouse reports, and the scene isn't repainted just
+        because the window moved.
         """
         self.is_dragging = False
         if evt.button() == Qt.LeftButton:
@@ -394,9 +586,11 @@ class PomodoroClockView(OverlayGraphicsView, QColorThemedGraphicsObject):
     def mouseMoveEvent(self, evt):
         self.is_dragging = True
         if Qt.LeftButton & evt.buttons():
-            self.move(evt.globalPos() - self.dragPosition)
+            self.begin_move()
+            self.move_to(evt.globalPos() - self.dragPosition)
             evt.accept()
     def mouseReleaseEvent(self, evt):
+        self.end_move()
         if not self.is_dragging:
             if self.pomodoro_control.is_running:
                 self.pomodoro_pause_requested.emit()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""The timing and state logic of a pomodoro segment, with no GUI or event
+loop attached.
+
+Drivers own the clock and the timer: they feed the current monotonic time
+(in milliseconds) into a PomodoroCore, arm a single wakeup for
+next_wakeup(), and turn what tick() returns into their own kind of events.
+PomodoroDriver drives it from a QtClock-style clock, for PomodoroControl
+and the terminal front end; AsyncPomodoroControl is the asyncio driver.
+"""
+
+# A wakeup this close to a second boundary counts as having reached it,
+# so a timer that fires a hair early doesn't cost an extra wakeup.
+TICK_SLACK_MS = 5
+
+
+def next_boundary(elapsed_ms, duration_ms):
+    """Milliseconds into a segment of duration_ms at which the next wakeup
+    is due: the next whole second after elapsed_ms, or the deadline if
+    that comes sooner."""
+    boundary = ((elapsed_ms + TICK_SLACK_MS) // 1000 + 1) * 1000
+    return min(boundary, duration_ms)
+
+
+class PomodoroCore(object):
+    """One pomodoro segment, measured against a driver-supplied monotonic
+    clock. Elapsed and remaining time are recomputed from the start and
+    end deadlines on every tick, so they never drift.
+    """
+    def __init__(self):
+        self.start_ms = 0
+        self.duration_ms = 0
+        self.seconds_elapsed = 0
+        self.seconds_remaining = 0
+        self.is_running = False
+
+    @property
+    def deadline_ms(self):
+        return self.start_ms + self.duration_ms
+
+    def start(self, seconds_remaining, now_ms):
+        self.start_ms = now_ms
+        self.duration_ms = int(seconds_remaining * 1000)
+        self.seconds_elapsed = 0
+        self.seconds_remaining = seconds_remaining
+        self.is_running = True
+
+    def resume(self, planned_seconds, seconds_remaining, now_ms):
+        """Pick up a segment of planned_seconds that has seconds_remaining
+        left as of now_ms, e.g. one restored after a restart."""
+        elapsed = planned_seconds - seconds_remaining
+        self.start(planned_seconds, now_ms - int(elapsed * 1000))
+        self.tick(now_ms)
+
+    def early_finish(self):
+        self.is_running = False
+
+    def tick(self, now_ms):
+        """Bring the elapsed and remaining time up to now_ms. Returns True
+        if this tick completed the segment."""
+        if not self.is_running:
+            return False
+        elapsed_ms = min(now_ms - self.start_ms, self.duration_ms)
+        if elapsed_ms + TICK_SLACK_MS >= self.duration_ms:
+            self.seconds_elapsed = self.duration_ms / 1000.
+            self.seconds_remaining = 0
+            self.is_running = False
+            return True
+        self.seconds_elapsed = elapsed_ms / 1000.
+        self.seconds_remaining = (self.duration_ms - elapsed_ms) / 1000.
+        return False
+
+    def next_wakeup(self, now_ms):
+        """Milliseconds from now_ms until the driver should call tick()
+        again, or None when the segment isn't running."""
+        if not self.is_running:
+            return None
+        elapsed_ms = now_ms - self.start_ms
+        return max(0, next_boundary(elapsed_ms, self.duration_ms) - elapsed_ms)
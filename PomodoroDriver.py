@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Drives a PomodoroCore from a clock and a single-shot timer, with no
+event loop of its own.
+
+The clock is anything with the QtClock/VirtualClock interface: now_ms()
+and timer(callback). PomodoroControl mixes this into a QObject with Qt
+signals; the terminal front end mixes it into a plain object with
+callback lists.
+"""
+from PomodoroCore import PomodoroCore
+from TimingStats import timing
+
+
+class PomodoroDriver(object):
+    """The methods of a pomodoro control, for a class that provides the
+    pomodoro_begin, pomodoro_complete and time_update signals and calls
+    init_driver() from its constructor.
+
+    A single-shot timer is armed for the next whole-second boundary (or
+    the deadline, if that comes first), so late or missed ticks never
+    accumulate into drift. How late each wakeup is gets recorded in the
+    wakeup histogram named after the class.
+    """
+    def init_driver(self, clock):
+        self.clock = clock
+        self.timer = self.clock.timer(self.handle_second)
+        self.core = PomodoroCore()
+        self._due_ms = None
+        self._lateness = timing.wakeup(type(self).__name__)
+
+    @property
+    def is_running(self):
+        return self.core.is_running
+
+    @property
+    def seconds_elapsed(self):
+        return self.core.seconds_elapsed
+
+    @property
+    def seconds_remaining(self):
+        return self.core.seconds_remaining
+
+    def start(self, seconds_remaining):
+        now = self.clock.now_ms()
+        self.core.start(seconds_remaining, now)
+        self.arm(now)
+        self.pomodoro_begin.emit()
+        self.time_update.emit(self.seconds_elapsed, self.seconds_remaining)
+
+    def resume(self, planned_seconds, seconds_remaining):
+        """Continue a segment of planned_seconds with seconds_remaining
+        left, as if it had been running all along. Returns False, without
+        beginning anything, if less than a tick was left."""
+        now = self.clock.now_ms()
+        self.core.resume(planned_seconds, seconds_remaining, now)
+        if not self.arm(now):
+            return False
+        self.pomodoro_begin.emit()
+        self.time_update.emit(self.seconds_elapsed, self.seconds_remaining)
+        return True
+
+    def early_finish(self):
+        self.timer.stop()
+        self.core.early_finish()
+        self.pomodoro_complete.emit()
+
+    def arm(self, now):
+        """Set the timer for the core's next wakeup. Returns False, with
+        the timer stopped, if the core isn't running."""
+        wakeup = self.core.next_wakeup(now)
+        if wakeup is None:
+            self.timer.stop()
+            self._due_ms = None
+            return False
+        self._due_ms = now + wakeup
+        self.timer.start(wakeup)
+        return True
+
+    def handle_second(self):
+        if not self.core.is_running:
+            # A timer that fired after early_finish().
+            return
+        now = self.clock.now_ms()
+        self._lateness.record(now - self._due_ms)
+        completed = self.core.tick(now)
+        if self.core.is_running:
+            self.arm(now)
+        self.time_update.emit(self.seconds_elapsed, self.seconds_remaining)
+        if completed:
+            self.pomodoro_complete.emit()
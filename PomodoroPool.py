@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+import heapq
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from PomodoroCore import TICK_SLACK_MS, next_boundary
+from pomodoroControl import QtClock
+
+
+class PomodoroPool(QObject):
+    """Any number of named pomodoro countdowns behind a single timer.
+
+    Each running countdown has exactly one live entry in a heap of
+    (due time, ...) wakeups: its next whole second or its deadline. The
+    one QTimer is armed for the earliest entry, and each wakeup services
+    every countdown that is due, so thousands of countdowns cost one OS
+    timer instead of thousands. Start is O(log n); cancel and early
+    finish are O(1) and leave a stale heap entry that is skipped when it
+    surfaces.
+
+    The signals mirror PomodoroControl's, with the countdown's name as
+    the first argument. time_updates carries every update from one
+    wakeup as a list of (name, elapsed, remaining) for consumers that
+    would rather handle a batch than one signal per countdown.
+    """
+    pomodoro_begin = pyqtSignal(str)
+    pomodoro_complete = pyqtSignal(str)
+    time_update = pyqtSignal(str, float, float)
+    # signal: name, number of seconds elapsed, number of seconds remaining
+    time_updates = pyqtSignal(list)
+
+    def __init__(self, parent=None, clock=None):
+        super(PomodoroPool, self).__init__(parent)
+        self.clock = clock or QtClock(self)
+        self.timer = self.clock.timer(self.handle_wakeup)
+        # name -> [start ms, duration ms, generation]
+        self._timers = {}
+        # (due ms, sequence, name, generation)
+        self._heap = []
+        self._sequence = 0
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, name):
+        return name in self._timers
+
+    def is_running(self, name):
+        return name in self._timers
+
+    def seconds_remaining(self, name):
+        start, duration, _ = self._timers[name]
+        return max(0, duration - (self.clock.now_ms() - start)) / 1000.
+
+    def start(self, name, seconds_remaining):
+        """Start (or restart) the countdown called name."""
+        now = self.clock.now_ms()
+        self._generation += 1
+        timer = [now, int(seconds_remaining * 1000), self._generation]
+        self._timers[name] = timer
+        self._push(name, timer, now)
+        self._arm(now)
+        self.pomodoro_begin.emit(name)
+        self.time_update.emit(name, 0, seconds_remaining)
+
+    def cancel(self, name):
+        """Forget the countdown called name without completing it."""
+        if self._timers.pop(name, None) is not None:
+            self._compact()
+
+    def early_finish(self, name):
+        if self._timers.pop(name, None) is not None:
+            self._compact()
+            self.pomodoro_complete.emit(name)
+
+    def _push(self, name, timer, elapsed_ms):
+        start, duration, generation = timer
+        self._sequence += 1
+        heapq.heappush(self._heap,
+                       (start + next_boundary(elapsed_ms - start, duration),
+                        self._sequence, name, generation))
+
+    def _is_stale(self, entry):
+        timer = self._timers.get(entry[2])
+        return timer is None or timer[2] != entry[3]
+
+    def _compact(self):
+        """Rebuild the heap once stale entries outnumber live ones."""
+        if len(self._heap) > 2 * len(self._timers) + 64:
+            self._heap = [e for e in self._heap if not self._is_stale(e)]
+            heapq.heapify(self._heap)
+
+    def _arm(self, now):
+        heap = self._heap
+        while heap and self._is_stale(heap[0]):
+            heapq.heappop(heap)
+        if heap:
+            self.timer.start(max(0, heap[0][0] - now))
+        else:
+            self.timer.stop()
+
+    def handle_wakeup(self):
+        now = self.clock.now_ms()
+        heap = self._heap
+        updates = []
+        completed = []
+        while heap and heap[0][0] <= now + TICK_SLACK_MS:
+            entry = heapq.heappop(heap)
+            if self._is_stale(entry):
+                continue
+            name = entry[2]
+            timer = self._timers[name]
+            start, duration, _ = timer
+            elapsed_ms = min(now - start, duration)
+            if elapsed_ms + TICK_SLACK_MS >= duration:
+                del self._timers[name]
+                updates.append((name, duration / 1000., 0.))
+                completed.append(name)
+            else:
+                self._push(name, timer, now)
+                updates.append((name, elapsed_ms / 1000.,
+                                (duration - elapsed_ms) / 1000.))
+        self._arm(now)
+        for name, elapsed, remaining in updates:
+            self.time_update.emit(name, elapsed, remaining)
+        if updates:
+            self.time_updates.emit(updates)
+        for name in completed:
+            self.pomodoro_complete.emit(name)
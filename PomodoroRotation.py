@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""The color and segment-length rotation the overlay cycles through.
+
+Colors are kept as hex strings so the rotation doesn't need Qt; the GUI
+turns them into QColors when it applies them. Segment lengths come from
+a compiled PomodoroSchedule timeline.
+"""
+from datetime import date
+
+from PomodoroSchedule import DEFAULT_PLAN
+
+# Tomorrow theme, https://github.com/chriskempson/tomorrow-theme
+COLORS = ["c82829",
+          "f5871f",
+          "eab700",
+          "718c00",
+          "3e999f",
+          "4271ae",
+          "8959a8",
+          "4d4d4c",
+          ]
+OUTLINE_COLOR = "4d4d4c"
+
+
+class PomodoroRotation(object):
+    """Positions in the color rotation and the schedule's timeline.
+    color_index and segment_index point at the entries in use, or are -1
+    before the first one is picked.
+
+    The timeline is the default plan's unless one is given. If it has
+    daily limits it is a single day: next_minutes() returns None once
+    the day's segments are used up, and starts from the top again on the
+    next day. day is the date.toordinal() of the day segment_index
+    counts in."""
+    def __init__(self, colors=COLORS, timeline=None):
+        self.colors = list(colors)
+        self.timeline = timeline or DEFAULT_PLAN.compile()
+        self.minutes = self.timeline.minutes
+        self.color_index = -1
+        self.segment_index = -1
+        self.day = None
+
+    def next_color(self):
+        self.color_index = (self.color_index + 1) % len(self.colors)
+        return self.colors[self.color_index]
+
+    def next_minutes(self, today=None):
+        """The length of the next segment, or None if the day's schedule
+        is done."""
+        timeline = self.timeline
+        if timeline.repeats:
+            self.segment_index = (self.segment_index + 1) % len(timeline)
+            return self.minutes[self.segment_index]
+        today = today or date.today().toordinal()
+        if self.day is not None and today != self.day:
+            self.segment_index = -1
+        self.day = today
+        segment = timeline.segment(self.segment_index + 1)
+        if segment is None:
+            return None
+        self.segment_index = segment.index
+        return segment.minutes
+
+    def current_segment(self):
+        """The Segment in use, or None before the first one."""
+        return self.timeline.segment(self.segment_index)
+
+    def upcoming(self):
+        """The segments still to come, lazily."""
+        return self.timeline.upcoming(self.segment_index + 1)
+
+
+class PomodoroCycle(object):
+    """Runs a rotation on a pomodoro control the way the overlay does:
+    every begin request starts the next segment length, and every
+    completed segment moves on to the next color, which is handed to
+    set_color."""
+    def __init__(self, pomodoro_control, rotation, set_color):
+        self.pomodoro_control = pomodoro_control
+        self.rotation = rotation
+        self.set_color = set_color
+        pomodoro_control.pomodoro_complete.connect(self.next_color)
+
+    def next_color(self):
+        self.set_color(self.rotation.next_color())
+
+    def next_pomodoro(self):
+        minutes = self.rotation.next_minutes()
+        if minutes is not None:
+            self.pomodoro_control.start(minutes * 60)
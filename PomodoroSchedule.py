@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""The pomodoro schedule, declared as a plan and compiled into a timeline.
+
+A SchedulePlan says how long work and breaks are, how often the long
+break comes, and optionally how much work a day may hold:
+
+    plan = SchedulePlan(work=50, short_break=10, long_break=30,
+                        long_break_every=3, daily_work_segments=9)
+    timeline = plan.compile()
+
+The Timeline holds every segment of a day (or, with no daily limits,
+one repeating cycle) with its start and end, so "which segment is it,
+and how much of it is left, T seconds in" is a bisect, and the n'th
+upcoming segment is an index away. Plans can live in a JSON file with
+the same keys as SchedulePlan's arguments; see load_plan().
+"""
+import bisect
+import json
+import os
+from collections import namedtuple
+
+WORK = "work"
+SHORT_BREAK = "short_break"
+LONG_BREAK = "long_break"
+
+# start and end are seconds from the start of the timeline, assuming each
+# segment starts as soon as the one before it ends.
+Segment = namedtuple("Segment", "index kind minutes start end")
+
+# The most segments a timeline may hold: the session log stores segment
+# indexes in a byte.
+MAX_SEGMENTS = 256
+
+
+class SchedulePlan(object):
+    """Work and break lengths (in minutes), the number of work segments
+    per long break, and optional limits on work segments or work minutes
+    per day. The defaults are the classic 25/5 with a 15 minute break
+    after every fourth pomodoro."""
+    def __init__(self, work=25, short_break=5, long_break=15,
+                 long_break_every=4, daily_work_segments=None,
+                 daily_work_minutes=None):
+        if work <= 0:
+            raise ValueError("work segments need a positive length: %r"
+                             % (work,))
+        if not 1 <= long_break_every <= MAX_SEGMENTS // 2:
+            raise ValueError("long_break_every must be from 1 to %d: %r"
+                             % (MAX_SEGMENTS // 2, long_break_every))
+        self.work = work
+        self.short_break = short_break
+        self.long_break = long_break
+        self.long_break_every = long_break_every
+        self.daily_work_segments = daily_work_segments
+        self.daily_work_minutes = daily_work_minutes
+
+    @property
+    def has_daily_limit(self):
+        return (self.daily_work_segments is not None or
+                self.daily_work_minutes is not None)
+
+    def cycle(self):
+        """(kind, minutes) of each segment of one long-break cycle."""
+        kinds = []
+        for i in range(self.long_break_every):
+            kinds.append((WORK, self.work))
+            if i + 1 < self.long_break_every:
+                kinds.append((SHORT_BREAK, self.short_break))
+            else:
+                kinds.append((LONG_BREAK, self.long_break))
+        return [(kind, minutes) for kind, minutes in kinds if minutes > 0]
+
+    def compile(self):
+        """The Timeline of a day under this plan: the cycle repeated until
+        the next work segment would break a daily limit, or one cycle that
+        repeats forever if there are no limits. A day is cut short at
+        MAX_SEGMENTS segments."""
+        cycle = self.cycle()
+        if not self.has_daily_limit:
+            return Timeline(self._segments(cycle), repeats=True)
+        kinds = []
+        work_segments = 0
+        work_minutes = 0
+        while (self._room_for_work(work_segments, work_minutes) and
+               len(kinds) < MAX_SEGMENTS):
+            for kind, minutes in cycle:
+                if len(kinds) == MAX_SEGMENTS:
+                    break
+                if kind == WORK:
+                    if not self._room_for_work(work_segments, work_minutes):
+                        break
+                    work_segments += 1
+                    work_minutes += minutes
+                kinds.append((kind, minutes))
+        # The day doesn't end on a break.
+        while kinds and kinds[-1][0] != WORK:
+            kinds.pop()
+        return Timeline(self._segments(kinds), repeats=False)
+
+    def _room_for_work(self, work_segments, work_minutes):
+        """Whether another work segment fits in a day that already has
+        work_segments of them, adding up to work_minutes."""
+        if (self.daily_work_segments is not None and
+            work_segments >= self.daily_work_segments):
+            return False
+        if (self.daily_work_minutes is not None and
+            work_minutes + self.work > self.daily_work_minutes):
+            return False
+        return True
+
+    def _segments(self, kinds):
+        segments = []
+        start = 0
+        for index, (kind, minutes) in enumerate(kinds):
+            end = start + minutes * 60
+            segments.append(Segment(index, kind, minutes, start, end))
+            start = end
+        return segments
+
+    def state(self):
+        return {"work": self.work, "short_break": self.short_break,
+                "long_break": self.long_break,
+                "long_break_every": self.long_break_every,
+                "daily_work_segments": self.daily_work_segments,
+                "daily_work_minutes": self.daily_work_minutes}
+
+
+class Timeline(object):
+    """The compiled schedule. If repeats, the segments are one cycle that
+    goes on forever and indexes keep counting past its end; otherwise
+    they are all there is.
+
+    segment(index) is O(1), segment_at(seconds) O(log n), and upcoming()
+    generates segments lazily, so asking about the future never means
+    replaying the rotation.
+    """
+    def __init__(self, segments, repeats):
+        self.segments = tuple(segments)
+        self.repeats = repeats and bool(self.segments)
+        self.starts = [segment.start for segment in self.segments]
+        self.duration = self.segments[-1].end if self.segments else 0
+        # Minutes per segment, in the order PomodoroRotation walks them.
+        self.minutes = [segment.minutes for segment in self.segments]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def segment(self, index):
+        """The segment at index, or None past the end of a timeline that
+        doesn't repeat."""
+        if index < 0:
+            return None
+        if not self.repeats:
+            if index >= len(self.segments):
+                return None
+            return self.segments[index]
+        cycle, position = divmod(index, len(self.segments))
+        segment = self.segments[position]
+        offset = cycle * self.duration
+        return Segment(index, segment.kind, segment.minutes,
+                       segment.start + offset, segment.end + offset)
+
+    def segment_at(self, seconds):
+        """(segment, seconds left in it) at seconds into the timeline, or
+        None before its start or after the end of one that doesn't
+        repeat."""
+        if seconds < 0 or not self.segments:
+            return None
+        cycle = 0
+        if self.repeats:
+            cycle, seconds = divmod(seconds, self.duration)
+        elif seconds >= self.duration:
+            return None
+        position = bisect.bisect_right(self.starts, seconds) - 1
+        segment = self.segment(int(cycle) * len(self.segments) + position)
+        return segment, self.segments[position].end - seconds
+
+    def upcoming(self, index=0):
+        """The segments from index on, generated as they are asked for.
+        Endless if the timeline repeats."""
+        while True:
+            segment = self.segment(index)
+            if segment is None:
+                return
+            yield segment
+            index += 1
+
+    def work_indexes(self):
+        """Positions of the work segments, e.g. for PomodoroStats."""
+        return [segment.index for segment in self.segments
+                if segment.kind == WORK]
+
+
+def load_plan(path):
+    """The plan in the JSON file at path, or the default plan if there
+    is no such file."""
+    if not os.path.exists(path):
+        return SchedulePlan()
+    with open(path) as f:
+        settings = json.load(f)
+    if not isinstance(settings, dict):
+        raise ValueError("%s: expected an object of plan settings" % path)
+    try:
+        return SchedulePlan(**settings)
+    except TypeError as e:
+        raise ValueError("%s: %s" % (path, e))
+
+
+DEFAULT_PLAN = SchedulePlan()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""Productivity statistics over the session log, computed with NumPy.
+
+Records are decoded straight from the memory-mapped log into columnar
+arrays, and every aggregate is a bincount or a reduction over those
+columns. PomodoroStats keeps its aggregates between calls, so feeding it
+new records only costs work proportional to the new records.
+"""
+import time
+
+import numpy
+
+from SessionLog import HEADER, EARLY_FINISH
+
+RECORD_DTYPE = numpy.dtype([
+    ("start", "<f8"),
+    ("planned", "<u4"),
+    ("actual", "<u4"),
+    ("flags", "u1"),
+    ("segment", "u1"),
+    ("color", "u1"),
+    ("pad", "V1"),
+    ])
+
+DAY = 86400
+# 1970-01-01 was a Thursday; shifting by three days starts weeks on Monday.
+WEEK_SHIFT = 3
+
+
+def load_columns(reader, first=0):
+    """The log's records from index first onwards as a structured array.
+    The array is a view of the mapped file, not a copy."""
+    count = len(reader) - first
+    if count <= 0:
+        return numpy.zeros(0, dtype=RECORD_DTYPE)
+    return numpy.frombuffer(reader.buffer(), dtype=RECORD_DTYPE, count=count,
+                            offset=HEADER.size + first * RECORD_DTYPE.itemsize)
+
+
+def local_utc_offset():
+    """Seconds east of UTC for the local time zone, right now."""
+    if time.daylight and time.localtime().tm_isdst:
+        return -time.altzone
+    return -time.timezone
+
+
+class PomodoroStats(object):
+    """Running aggregates over pomodoro sessions.
+
+    minutes is the planned segment rotation (a schedule Timeline's
+    minutes), used to measure how closely the real schedule followed
+    it. Segments at work_segments indexes (its work_indexes()) count as
+    focus time; by default, every other segment starting from the first,
+    matching the work/break alternation.
+    Several users' logs can be fed into one instance to aggregate a team.
+    """
+    def __init__(self, minutes, work_segments=None, utc_offset=None):
+        self.minutes = numpy.asarray(minutes, dtype=numpy.float64)
+        if work_segments is None:
+            work_segments = range(0, len(minutes), 2)
+        self.is_work_segment = numpy.zeros(256, dtype=bool)
+        self.is_work_segment[list(work_segments)] = True
+        self.utc_offset = local_utc_offset() if utc_offset is None else utc_offset
+
+        self.count = 0
+        self.completed = 0
+        self.finished_early = 0
+        self.planned_seconds = 0.
+        self.actual_seconds = 0.
+        self.on_rotation = 0
+        self.first_day = None
+        self.focus_by_day = numpy.zeros(0)
+        self.completed_by_day = numpy.zeros(0, dtype=numpy.int64)
+        # Focus seconds by (weekday, hour), Monday first.
+        self.heatmap = numpy.zeros((7, 24))
+        self._log_positions = {}
+
+    def add(self, columns):
+        """Fold a structured array of RECORD_DTYPE records into the
+        aggregates."""
+        if len(columns) == 0:
+            return
+        local = columns["start"] + self.utc_offset
+        days = numpy.floor(local / DAY).astype(numpy.int64)
+        planned = columns["planned"] / 1000.
+        actual = columns["actual"] / 1000.
+        early = (columns["flags"] & EARLY_FINISH) != 0
+        work = self.is_work_segment[columns["segment"]]
+        focus = numpy.where(work, actual, 0.)
+        completed_work = work & ~early
+
+        self.count += len(columns)
+        self.finished_early += int(early.sum())
+        self.completed += len(columns) - int(early.sum())
+        self.planned_seconds += float(planned.sum())
+        self.actual_seconds += float(actual.sum())
+        expected = self.minutes[columns["segment"] % len(self.minutes)] * 60
+        self.on_rotation += int((numpy.abs(planned - expected) < 1).sum())
+
+        self._grow_days(int(days.min()), int(days.max()))
+        offsets = days - self.first_day
+        size = len(self.focus_by_day)
+        self.focus_by_day += numpy.bincount(offsets, weights=focus,
+                                            minlength=size)
+        self.completed_by_day += numpy.bincount(offsets, weights=completed_work,
+                                                minlength=size).astype(numpy.int64)
+
+        weekday = (days + WEEK_SHIFT) % 7
+        hour = ((local % DAY) // 3600).astype(numpy.int64)
+        self.heatmap += numpy.bincount(weekday * 24 + hour, weights=focus,
+                                       minlength=7 * 24).reshape(7, 24)
+
+    def update_from(self, reader):
+        """Fold in whatever reader's log has gained since the last call."""
+        reader.refresh()
+        first = self._log_positions.get(reader.path, 0)
+        self.add(load_columns(reader, first))
+        self._log_positions[reader.path] = len(reader)
+
+    def _grow_days(self, lo, hi):
+        if self.first_day is None:
+            self.first_day = lo
+        before = max(0, self.first_day - lo)
+        after = max(0, hi - (self.first_day + len(self.focus_by_day) - 1))
+        if before or after:
+            self.focus_by_day = numpy.concatenate([
+                numpy.zeros(before), self.focus_by_day, numpy.zeros(after)])
+            self.completed_by_day = numpy.concatenate([
+                numpy.zeros(before, dtype=numpy.int64), self.completed_by_day,
+                numpy.zeros(after, dtype=numpy.int64)])
+            self.first_day -= before
+
+    def daily_focus_minutes(self):
+        """(first day, array of focus minutes per day). Days are counted
+        from the epoch in local time."""
+        return self.first_day, self.focus_by_day / 60.
+
+    def weekly_focus_minutes(self):
+        """(first week, array of focus minutes per Monday-based week)."""
+        if self.first_day is None:
+            return None, numpy.zeros(0)
+        days = numpy.arange(len(self.focus_by_day)) + self.first_day
+        weeks = (days + WEEK_SHIFT) // 7
+        return int(weeks[0]), numpy.bincount(
+            weeks - weeks[0], weights=self.focus_by_day) / 60.
+
+    def completion_ratio(self):
+        """Fraction of segments that ran to the end rather than being
+        finished early."""
+        return self.completed / float(self.count) if self.count else 0.
+
+    def streaks(self):
+        """(current, longest) run of consecutive days with at least one
+        completed work segment. The current run may end yesterday."""
+        active = self.completed_by_day > 0
+        if not active.any():
+            return 0, 0
+        edges = numpy.diff(numpy.concatenate([[0], active.astype(numpy.int8), [0]]))
+        starts = numpy.flatnonzero(edges == 1)
+        ends = numpy.flatnonzero(edges == -1)
+        lengths = ends - starts
+        today = int((time.time() + self.utc_offset) // DAY) - self.first_day
+        current = int(lengths[-1]) if ends[-1] >= today else 0
+        return current, int(lengths.max())
+
+    def heatmap_minutes(self):
+        """Focus minutes by weekday (Monday first) and hour of day."""
+        return self.heatmap / 60.
+
+    def schedule_adherence(self):
+        """(fraction of segments whose planned length matched the rotation,
+        actual time as a fraction of planned time)."""
+        if not self.count:
+            return 0., 0.
+        return (self.on_rotation / float(self.count),
+                self.actual_seconds / self.planned_seconds
+                if self.planned_seconds else 0.)
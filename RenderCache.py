@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+
+import math
+
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPainterPath, QPixmap
+
+
+class PixmapCache(object):
+    """A least-recently-used cache of pre-rendered layers.
+
+    Keys are whatever tuple fully describes a layer's output (colors,
+    line widths, device size, devicePixelRatio...), so a theme change or
+    a resize simply misses and renders new entries; stale ones age out
+    of the cache on their own.
+    """
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, render):
+        """Return the pixmap for key, calling render() to build it on a
+        miss."""
+        pixmap = self._entries.pop(key, None)
+        if pixmap is None:
+            self.misses += 1
+            pixmap = render()
+            while len(self._entries) >= self.capacity:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+        self._entries[key] = pixmap
+        return pixmap
+
+    def discard(self, predicate):
+        """Drop every entry whose key satisfies predicate."""
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Shared by every view, so two clocks with the same theme and size
+# rasterize their faces once.
+LAYER_CACHE = PixmapCache()
+
+
+def device_size(painter, rect):
+    """The size in device pixels that rect covers when drawn with painter,
+    and the device's pixel ratio."""
+    dpr = painter.device().devicePixelRatioF()
+    mapped = painter.worldTransform().mapRect(rect)
+    return (max(1, int(round(mapped.width() * dpr))),
+            max(1, int(round(mapped.height() * dpr))),
+            dpr)
+
+
+def render_pixmap(rect, width, height, antialias, render_layer):
+    """A width x height pixmap of render_layer(painter) drawing the
+    logical area rect."""
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.transparent)
+    p = QPainter(pixmap)
+    p.setRenderHint(QPainter.Antialiasing, antialias)
+    p.scale(width / rect.width(), height / rect.height())
+    p.translate(-rect.x(), -rect.y())
+    render_layer(p)
+    p.end()
+    return pixmap
+
+
+def cached_layer(painter, rect, key, render_layer, cache=LAYER_CACHE):
+    """The cached rendering of render_layer(painter) covering rect, at the
+    resolution rect has when drawn with painter.
+
+    key must describe everything render_layer's output depends on; the
+    device size, pixel ratio and antialiasing are added to it here.
+    """
+    width, height, dpr = device_size(painter, rect)
+    antialias = bool(painter.renderHints() & QPainter.Antialiasing)
+    return cache.get(key + (width, height, dpr, antialias),
+                     lambda: render_pixmap(rect, width, height, antialias,
+                                           render_layer))
+
+
+def draw_cached_layer(painter, rect, key, render_layer, cache=LAYER_CACHE):
+    """Blit a cached rendering of render_layer(painter) covering rect."""
+    pixmap = cached_layer(painter, rect, key, render_layer, cache)
+    painter.drawPixmap(rect, pixmap, QRectF(pixmap.rect()))
+
+
+_tick_paths = {}
+
+def tick_marks_path(count, inner, outer, skip_every=0):
+    """A path of count radial tick marks around (0, 0), from radius inner
+    to radius outer, starting at 3 o'clock and going clockwise. Every
+    skip_every-th tick (counting the first) is left out, so minute marks
+    can leave room for hour marks. Stroke it with a single drawPath()
+    instead of drawing and rotating each line; the result is shared by
+    every caller asking for the same marks."""
+    key = (count, inner, outer, skip_every)
+    path = _tick_paths.get(key)
+    if path is None:
+        path = QPainterPath()
+        for i in range(count):
+            if skip_every and i % skip_every == 0:
+                continue
+            angle = 2 * math.pi * i / count
+            c, s = math.cos(angle), math.sin(angle)
+            path.moveTo(QPointF(inner * c, inner * s))
+            path.lineTo(QPointF(outer * c, outer * s))
+        _tick_paths[key] = path
+    return path
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""A persistent, append-only log of finished pomodoro segments.
+
+The file is an 8-byte header followed by fixed-width little-endian
+records, one per segment, in the order the segments started:
+
+    start time    float64  wall-clock seconds since the epoch
+    planned       uint32   planned duration, milliseconds
+    actual        uint32   actual duration, milliseconds
+    flags         uint8    bit 0: finished early
+    segment       uint8    index into the segment rotation
+    color         uint8    index into the color rotation
+    (padding)     1 byte
+
+Fixed-width records mean the reader can memory-map the file and reach
+any record, or binary-search by start time, without parsing the rest.
+"""
+import bisect
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"PWSL"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+RECORD = struct.Struct("<dIIBBBx")
+EARLY_FINISH = 1 << 0
+
+SessionRecord = namedtuple("SessionRecord", [
+    "start", "planned", "actual", "early_finish", "segment", "color"])
+# start is in seconds since the epoch; planned and actual are in seconds.
+
+
+class SessionLogWriter(object):
+    """Appends records to a session log, syncing them to disk in batches:
+    after sync_every records or sync_interval seconds, whichever comes
+    first."""
+    def __init__(self, path, sync_every=16, sync_interval=60.):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._file = open(path, "ab")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            # New, or a crash tore the header before anything was logged.
+            self._file.truncate(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self.sync()
+        else:
+            _check_header(path)
+            # Drop a record torn by a crash mid-write, so the ones appended
+            # after it stay aligned.
+            count = (size - HEADER.size) // RECORD.size
+            if size != HEADER.size + count * RECORD.size:
+                self._file.truncate(HEADER.size + count * RECORD.size)
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def append(self, start, planned, actual, early_finish=False,
+               segment=0, color=0):
+        self._file.write(RECORD.pack(
+            start, int(round(planned * 1000)), int(round(actual * 1000)),
+            EARLY_FINISH if early_finish else 0, segment, color))
+        self._pending += 1
+        if (self._pending >= self.sync_every or
+            time.time() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+class SessionLogReader(object):
+    """Memory-mapped, read-only access to a session log.
+
+    Every index_stride-th start time is kept in memory as a sparse index,
+    so a time-range query is a bisect over that index followed by a short
+    scan of the mapped file.
+    """
+    def __init__(self, path, index_stride=1024):
+        self.path = path
+        self.index_stride = index_stride
+        self._file = open(path, "rb")
+        self._map = None
+        self._count = 0
+        self._index = []
+        _check_header(path)
+        self.refresh()
+
+    def refresh(self):
+        """Pick up records appended since the log was opened."""
+        size = os.fstat(self._file.fileno()).st_size
+        count = (size - HEADER.size) // RECORD.size
+        if count == self._count:
+            return
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        for i in range(len(self._index) * self.index_stride, count,
+                       self.index_stride):
+            self._index.append(self._start(i))
+        self._count = count
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("session record index out of range")
+        start, planned, actual, flags, segment, color = RECORD.unpack_from(
+            self._map, HEADER.size + i * RECORD.size)
+        return SessionRecord(start, planned / 1000., actual / 1000.,
+                             bool(flags & EARLY_FINISH), segment, color)
+
+    def buffer(self):
+        """The mapped file, for readers that decode many records at once.
+        Records start at offset HEADER.size."""
+        return self._map if self._map is not None else b""
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def _start(self, i):
+        return struct.unpack_from("<d", self._map,
+                                  HEADER.size + i * RECORD.size)[0]
+
+    def bisect(self, t):
+        """The index of the first record starting at or after t."""
+        block = bisect.bisect_left(self._index, t) - 1
+        lo = max(0, block * self.index_stride)
+        hi = min(self._count, lo + self.index_stride + 1)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._start(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def between(self, start, end):
+        """Records that started in [start, end)."""
+        for i in range(self.bisect(start), self.bisect(end)):
+            yield self[i]
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("%s: truncated session log header" % path)
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError("%s: not a version %d session log" % (path, VERSION))
+
+
+class SessionRecorder(object):
+    """Writes a record for every segment a PomodoroControl runs, tagged
+    with the segment and color indexes of rotation (a PomodoroRotation)
+    if there is one.
+    """
+    def __init__(self, pomodoro_control, writer, rotation=None):
+        self.pomodoro_control = pomodoro_control
+        self.writer = writer
+        self.rotation = rotation
+        self._segment = 0
+        self._started = None
+        self._planned = 0
+        pomodoro_control.pomodoro_begin.connect(self.handle_begin)
+        pomodoro_control.pomodoro_complete.connect(self.handle_complete)
+
+    def handle_begin(self):
+        ctl = self.pomodoro_control
+        # A resumed segment began before this process did.
+        self._started = time.time() - ctl.seconds_elapsed
+        self._planned = ctl.seconds_elapsed + ctl.seconds_remaining
+        if self.rotation is not None:
+            self._segment = max(0, self.rotation.segment_index)
+
+    def handle_complete(self):
+        if self._started is None:
+            return
+        actual = min(time.time() - self._started, self._planned)
+        color = self.rotation.color_index if self.rotation is not None else 0
+        self.writer.append(self._started, self._planned, actual,
+                           early_finish=self.pomodoro_control.seconds_remaining > 0,
+                           segment=self._segment, color=max(0, color))
+        self._started = None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Crash-safe snapshots of the running pomodoro, for resuming after a
+restart.
+
+A snapshot is a small JSON document written whenever the state changes
+(a segment begins or completes, or the color moves on), never on ticks.
+It records the running segment by its absolute wall-clock deadline, so
+time spent while the app was down still counts. Writes go to a
+temporary file that is fsynced and renamed over the old snapshot, so a
+crash mid-write leaves the previous snapshot intact.
+"""
+import json
+import os
+import time
+
+VERSION = 1
+
+
+def write_atomically(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if hasattr(os, "replace"):
+        os.replace(tmp, path)
+    else:
+        os.rename(tmp, path)
+
+
+def load_snapshot(path):
+    """The saved state as a dict, or None if there is no usable snapshot."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != VERSION:
+        return None
+    return state
+
+
+class StateSnapshotter(object):
+    """Saves the state of pomodoro_control and rotation (a
+    PomodoroRotation) to path on every state transition, once watch()
+    has been called.
+    """
+    def __init__(self, path, pomodoro_control, rotation):
+        self.path = path
+        self.pomodoro_control = pomodoro_control
+        self.rotation = rotation
+
+    def watch(self):
+        """Start saving on every begin and complete. Call this after
+        connecting anything else that reacts to them (such as the color
+        rotation), so each snapshot sees their effects."""
+        self.pomodoro_control.pomodoro_begin.connect(self.save)
+        self.pomodoro_control.pomodoro_complete.connect(self.save)
+
+    def state(self):
+        ctl = self.pomodoro_control
+        rotation = self.rotation
+        state = {
+            "version": VERSION,
+            "segment_index": rotation.segment_index,
+            "day": rotation.day,
+            "color_index": rotation.color_index,
+            "color": (rotation.colors[rotation.color_index]
+                      if rotation.color_index >= 0 else None),
+            "running": ctl.is_running,
+            }
+        if ctl.is_running:
+            state["planned"] = ctl.seconds_elapsed + ctl.seconds_remaining
+            state["deadline"] = time.time() + ctl.seconds_remaining
+        return state
+
+    def save(self):
+        write_atomically(self.path, json.dumps(self.state(),
+                                               separators=(",", ":")))
+
+    def restore(self, state):
+        """Put the rotation back where state left it and resume the
+        segment if it is still running. Returns True if a segment was
+        resumed, False if it finished while we were away (or none was
+        running)."""
+        rotation = self.rotation
+        rotation.segment_index = state.get("segment_index", -1)
+        rotation.day = state.get("day")
+        rotation.color_index = state.get("color_index", -1)
+        if not state.get("running"):
+            return False
+        remaining = state["deadline"] - time.time()
+        if remaining <= 0 or remaining > state["planned"]:
+            return False
+        return self.pomodoro_control.resume(state["planned"], remaining)
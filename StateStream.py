@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""Pushes timer state to web dashboards as Server-Sent Events.
+
+    GET /events   text/event-stream: one "snapshot" event on connect,
+                  then a "delta" event with only the fields that changed
+    GET /state    the current state as JSON
+
+State is {"running", "planned", "deadline", "segment", "color"}, where
+deadline is wall-clock seconds since the epoch, so clients count down
+locally and nothing is sent per tick. Each delta is encoded once and the
+same bytes are queued on every connection.
+
+The server is a select() loop over non-blocking sockets on its own
+thread, like Telemetry's drain and HookDispatcher's workers, so it runs
+wherever the app does. publish() may be called from any thread; it
+hands the state over through a queue and wakes the loop with a pipe.
+"""
+import errno
+import fcntl
+import json
+import os
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+KEEPALIVE_INTERVAL = 15.
+# Clients that fall this far behind are disconnected rather than buffered.
+MAX_BUFFERED_BYTES = 64 * 1024
+MAX_REQUEST_BYTES = 8192
+
+# Errors that mean "try again once select() says so".
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+def encode_event(name, data):
+    return ("event: %s\ndata: %s\n\n" % (
+        name, json.dumps(data, sort_keys=True, separators=(",", ":")))
+        ).encode("utf-8")
+
+
+def response(status, body, content_type=b"text/plain"):
+    return (b"HTTP/1.1 " + status + b"\r\n"
+            b"Content-Type: " + content_type + b"\r\n"
+            b"Access-Control-Allow-Origin: *\r\n"
+            b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n"
+            b"Connection: close\r\n\r\n" + body)
+
+
+EVENTS_HEADER = (b"HTTP/1.1 200 OK\r\n"
+                 b"Content-Type: text/event-stream\r\n"
+                 b"Cache-Control: no-cache\r\n"
+                 b"Access-Control-Allow-Origin: *\r\n"
+                 b"Connection: keep-alive\r\n\r\n")
+
+
+class StreamConnection(object):
+    """One HTTP connection: answers a single GET, and for /events stays
+    open as an event stream. Output waits in outbox until the socket
+    can take it."""
+    def __init__(self, stream, sock):
+        self.stream = stream
+        self.sock = sock
+        self.request = b""    # None once the request has been read
+        self.outbox = bytearray()
+        self.subscribed = False
+        self.close_when_sent = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def handle_read(self):
+        """Read what the client sent. Returns False if it hung up."""
+        try:
+            data = self.sock.recv(4096)
+        except socket.error as e:
+            return e.args[0] in _WOULD_BLOCK
+        if not data:
+            return False
+        if self.request is None:
+            return True
+        self.request += data
+        if b"\r\n\r\n" not in self.request:
+            if len(self.request) > MAX_REQUEST_BYTES:
+                self.respond(b"431 Request Header Fields Too Large", b"")
+            return True
+        request_line = self.request.split(b"\r\n", 1)[0].split()
+        self.request = None
+        if len(request_line) < 2 or request_line[0] != b"GET":
+            self.respond(b"405 Method Not Allowed", b"")
+        elif request_line[1] == b"/events":
+            self.write(EVENTS_HEADER + self.stream.snapshot_bytes())
+            self.subscribed = True
+        elif request_line[1] == b"/state":
+            self.respond(b"200 OK",
+                         json.dumps(self.stream.state).encode("utf-8"),
+                         b"application/json")
+        else:
+            self.respond(b"404 Not Found", b"")
+        return True
+
+    def respond(self, status, body, content_type=b"text/plain"):
+        self.request = None
+        self.write(response(status, body, content_type))
+        self.close_when_sent = True
+
+    def write(self, data):
+        """Queue data. Returns False if the client is too far behind:
+        more than MAX_BUFFERED_BYTES is waiting even after handing the
+        socket what it takes right now."""
+        self.outbox += data
+        if len(self.outbox) > MAX_BUFFERED_BYTES:
+            self.handle_write()
+        return len(self.outbox) <= MAX_BUFFERED_BYTES
+
+    def handle_write(self):
+        """Send what the socket takes. Returns False once the connection
+        should be closed."""
+        try:
+            sent = self.sock.send(self.outbox)
+        except socket.error as e:
+            return e.args[0] in _WOULD_BLOCK
+        del self.outbox[:sent]
+        return bool(self.outbox) or not self.close_when_sent
+
+    def close(self):
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+
+class StateStream(object):
+    """An embedded SSE server for the pomodoro state."""
+    def __init__(self, host="127.0.0.1", port=8765):
+        self.host = host
+        self.port = port
+        self.state = {"running": False, "planned": 0, "deadline": None,
+                      "segment": -1, "color": None}
+        self.connections = []
+        self._listener = None
+        self._thread = None
+        self._snapshot = None
+        self._pending = deque()
+        self._wake_r = self._wake_w = None
+        self._stopping = False
+
+    @property
+    def subscribers(self):
+        return [c for c in self.connections if c.subscribed]
+
+    def start(self):
+        """Start serving on a background thread. Returns once listening,
+        or raises what kept the server from listening (e.g. the port is
+        in use)."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, self.port))
+            listener.listen(16)
+        except socket.error:
+            listener.close()
+            raise
+        listener.setblocking(False)
+        self._listener = listener
+        self.port = listener.getsockname()[1]
+        self._wake_r, self._wake_w = os.pipe()
+        for fd in (self._wake_r, self._wake_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL,
+                        fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="state-stream")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping = True
+            self._wake()
+            self._thread.join()
+            self._thread = None
+
+    def publish(self, **state):
+        """Merge state into the current state and push what changed."""
+        if self._thread is not None:
+            self._pending.append(state)
+            self._wake()
+        else:
+            self.state.update(state)
+            self._snapshot = None
+
+    def attach(self, pomodoro_control, rotation):
+        """Publish pomodoro_control's transitions along with rotation's
+        position. Connect this after the rotation, so a completed segment
+        is published with the color it moved on to."""
+        def update():
+            ctl = pomodoro_control
+            running = ctl.is_running
+            self.publish(
+                running=running,
+                planned=ctl.seconds_elapsed + ctl.seconds_remaining if running else 0,
+                deadline=time.time() + ctl.seconds_remaining if running else None,
+                segment=rotation.segment_index,
+                color=(rotation.colors[rotation.color_index]
+                       if rotation.color_index >= 0 else None))
+        pomodoro_control.pomodoro_begin.connect(update)
+        pomodoro_control.pomodoro_complete.connect(update)
+        update()
+
+    def snapshot_bytes(self):
+        if self._snapshot is None:
+            self._snapshot = encode_event("snapshot", self.state)
+        return self._snapshot
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass # the pipe is full, so the loop is awake already
+
+    def _run(self):
+        next_keepalive = time.time() + KEEPALIVE_INTERVAL
+        try:
+            while not self._stopping:
+                writers = [c for c in self.connections if c.outbox]
+                timeout = max(0, next_keepalive - time.time())
+                try:
+                    readable, writable, _ = select.select(
+                        [self._listener, self._wake_r] + self.connections,
+                        writers, [], timeout)
+                except (select.error, OSError) as e:
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                if self._wake_r in readable:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except OSError:
+                        pass
+                    while self._pending:
+                        self._apply(self._pending.popleft())
+                if self._listener in readable:
+                    self._accept()
+                for connection in readable:
+                    if (isinstance(connection, StreamConnection) and
+                        not connection.handle_read()):
+                        self._drop(connection)
+                for connection in writable:
+                    if (connection in self.connections and
+                        not connection.handle_write()):
+                        self._drop(connection)
+                if time.time() >= next_keepalive:
+                    self._broadcast(b": keepalive\n\n")
+                    next_keepalive = time.time() + KEEPALIVE_INTERVAL
+        finally:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+            self._listener.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._listener.accept()
+            except socket.error as e:
+                if e.args[0] in _WOULD_BLOCK + (errno.ECONNABORTED,):
+                    return
+                raise
+            sock.setblocking(False)
+            self.connections.append(StreamConnection(self, sock))
+
+    def _drop(self, connection):
+        if connection in self.connections:
+            self.connections.remove(connection)
+            connection.close()
+
+    def _apply(self, state):
+        delta = dict((k, v) for k, v in state.items()
+                     if self.state.get(k) != v)
+        if not delta:
+            return
+        self.state.update(delta)
+        self._snapshot = None
+        self._broadcast(encode_event("delta", delta))
+
+    def _broadcast(self, data):
+        for connection in self.subscribers:
+            if not connection.write(data):
+                self._drop(connection)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+import sys
+import time
+from array import array
+
+from PyQt5.QtCore import QPointF, QRectF, Qt, QTime
+from PyQt5.QtGui import QPainter
+from PyQt5.QtWidgets import (
+    QGraphicsItem, QGraphicsObject, QGraphicsScene, QGraphicsView,
+    )
+
+from ClockTheme import THEMES, to_color
+from ClockTicker import ClockTicker
+from PomodoroClockView import ClockBack, SynchronizedClockHand, TimeElapsedView
+from RenderCache import cached_layer, device_size, render_pixmap
+
+# Each clock is 100 units across in a 120 unit cell, the same margin
+# PomodoroClockView leaves around its one clock.
+CLOCK_SIZE = 100
+CELL_SIZE = 120
+THICKNESS = 15
+# Faces of clocks that aren't running are faded out.
+IDLE_ALPHA = 96
+
+
+class ClockWall(QGraphicsObject):
+    """A whole team's clocks, laid out in a grid and drawn as one item.
+
+    The clocks are flyweights. Per clock there is only a deadline, a
+    planned length and a color index, kept in arrays; a clock's name maps
+    to its position in them. Everything else is shared:
+
+    - faces come from one ClockBack per color (and one faded one for
+      idle clocks), rasterized once through the shared layer cache and
+      blitted for every clock of that color in one drawPixmapFragments()
+      call;
+    - the hands are the same on every clock, so one pair of
+      SynchronizedClockHands is rendered once per tick and blitted the
+      same way;
+    - only the arcs are drawn per clock, with pens shared by color.
+
+    So a repaint is a couple of C++ calls plus two drawArc() calls per
+    running clock, instead of four Python paint() calls per clock.
+    """
+    def __init__(self, colors, outline_color, columns=16, parent=None,
+                 ticker=None):
+        super(ClockWall, self).__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.columns = columns
+        self.names = []
+        self.indexes = {}
+        # Seconds since the epoch; 0 while the clock isn't running.
+        self.deadlines = array("d")
+        self.planned = array("d")
+        self.color_indexes = array("B")
+
+        ticker = ticker or ClockTicker.shared()
+        self.hour_hand = SynchronizedClockHand(
+            "hour", 50, 50, 37*0.66, 2.3, ticker=ticker)
+        self.minute_hand = SynchronizedClockHand(
+            "minute", 50, 50, 37, 2, ticker=ticker)
+        self._hands = None
+        self.set_colors(colors, outline_color)
+        # The hands pass every clock's tick on to the shared rendering.
+        ticker.second_changed.connect(self.handle_tick)
+
+    def set_colors(self, colors, outline_color):
+        """Use the QColors in colors for the clocks' color indexes."""
+        self.colors = list(colors)
+        self.faces = []
+        self.idle_faces = []
+        self.pens = []
+        for color in self.colors:
+            theme = THEMES.get(color, outline_color)
+            faces = []
+            for alpha in (255, IDLE_ALPHA):
+                face = ClockBack(CLOCK_SIZE)
+                face.set_theme(theme)
+                face.set_alpha(alpha)
+                faces.append(face)
+            self.faces.append(faces[0])
+            self.idle_faces.append(faces[1])
+            self.pens.append(theme.arc_pens(THICKNESS))
+        hands_theme = THEMES.hands(outline_color)
+        self.hour_hand.set_theme(hands_theme)
+        self.minute_hand.set_theme(hands_theme)
+        self._hands = None
+        self.update()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_clock(self, name, color_index=0):
+        """Add an idle clock called name; return its index."""
+        if name in self.indexes:
+            return self.indexes[name]
+        self.prepareGeometryChange()
+        index = len(self.names)
+        self.names.append(name)
+        self.indexes[name] = index
+        self.deadlines.append(0.)
+        self.planned.append(0.)
+        self.color_indexes.append(color_index % len(self.colors))
+        self.update(self.cell_rect(index))
+        return index
+
+    def start_clock(self, name, seconds_remaining, planned=None):
+        """Show name's clock counting down seconds_remaining from now."""
+        index = self.add_clock(name)
+        self.deadlines[index] = time.time() + seconds_remaining
+        self.planned[index] = planned or seconds_remaining
+        self.update(self.cell_rect(index))
+
+    def stop_clock(self, name, next_color=True):
+        """Show name's clock as idle; by default it moves on to the next
+        color, the way the overlay does when a segment completes."""
+        index = self.indexes.get(name)
+        if index is None:
+            return
+        self.deadlines[index] = 0.
+        if next_color:
+            self.color_indexes[index] = ((self.color_indexes[index] + 1) %
+                                         len(self.colors))
+        self.update(self.cell_rect(index))
+
+    def set_color_index(self, name, color_index):
+        index = self.add_clock(name)
+        self.color_indexes[index] = color_index % len(self.colors)
+        self.update(self.cell_rect(index))
+
+    def attach(self, pool):
+        """Follow every countdown of a PomodoroPool."""
+        def begin(name):
+            remaining = pool.seconds_remaining(name)
+            self.start_clock(name, remaining)
+        pool.pomodoro_begin.connect(begin)
+        pool.pomodoro_complete.connect(self.stop_clock)
+
+    def handle_tick(self, time):
+        self.update()
+
+    def cell_rect(self, index):
+        row, column = divmod(index, self.columns)
+        return QRectF(column * CELL_SIZE, row * CELL_SIZE,
+                      CELL_SIZE, CELL_SIZE)
+
+    def boundingRect(self):
+        rows = (len(self.names) + self.columns - 1) // self.columns
+        return QRectF(0, 0, self.columns * CELL_SIZE, max(1, rows) * CELL_SIZE)
+
+    def exposed_indexes(self, rect):
+        """The indexes of the clocks whose cells intersect rect."""
+        count = len(self.names)
+        first_row = max(0, int(rect.top() // CELL_SIZE))
+        last_row = int(rect.bottom() // CELL_SIZE)
+        first_column = max(0, int(rect.left() // CELL_SIZE))
+        last_column = min(self.columns - 1, int(rect.right() // CELL_SIZE))
+        for row in range(first_row, last_row + 1):
+            start = row * self.columns
+            if start >= count:
+                break
+            for index in range(start + first_column,
+                               min(count, start + last_column + 1)):
+                yield index
+
+    def hands_pixmap(self, painter, rect):
+        """The hands, rendered once for every clock at this tick."""
+        width, height, dpr = device_size(painter, rect)
+        antialias = bool(painter.renderHints() & QPainter.Antialiasing)
+        key = (self.hour_hand.rotation(), self.minute_hand.rotation(),
+               width, height, antialias)
+        if self._hands is None or self._hands[0] != key:
+            def render(p):
+                for hand in (self.hour_hand, self.minute_hand):
+                    p.save()
+                    p.setTransform(hand.sceneTransform(), True)
+                    hand.paint(p, None, None)
+                    p.restore()
+            self._hands = (key, render_pixmap(rect, width, height, antialias,
+                                              render))
+        return self._hands[1]
+
+    def paint(self, painter, option, widget):
+        indexes = list(self.exposed_indexes(option.exposedRect))
+        if not indexes:
+            return
+        now = time.time()
+        clock_time = QTime.currentTime()
+        offset = (CELL_SIZE - CLOCK_SIZE) / 2.
+
+        # Faces: one batch per face pixmap.
+        batches = {}
+        for index in indexes:
+            color = self.color_indexes[index]
+            idle = not self.deadlines[index]
+            batches.setdefault((color, idle), []).append(index)
+        for (color, idle), members in batches.items():
+            face = (self.idle_faces if idle else self.faces)[color]
+            self.draw_fragments(painter, members, face.boundingRect(),
+                                cached_layer(painter, face.boundingRect(),
+                                             face.cache_key(),
+                                             face.paint_face))
+
+        # Arcs: the only per-clock drawing.
+        deadlines, planned = self.deadlines, self.planned
+        for index in indexes:
+            deadline = deadlines[index]
+            if not deadline:
+                continue
+            remaining = min(max(0., deadline - now), planned[index])
+            remaining_pen, elapsed_pen = self.pens[self.color_indexes[index]]
+            cell = self.cell_rect(index)
+            TimeElapsedView.paint_arcs(
+                painter,
+                QRectF(cell.x() + offset, cell.y() + offset,
+                       CLOCK_SIZE, CLOCK_SIZE),
+                THICKNESS, remaining_pen, elapsed_pen, clock_time,
+                planned[index] - remaining, remaining)
+
+        # Hands: the same pixmap on every clock.
+        hands_rect = QRectF(0, 0, CLOCK_SIZE, CLOCK_SIZE)
+        self.draw_fragments(painter, indexes, hands_rect,
+                            self.hands_pixmap(painter, hands_rect))
+
+    def draw_fragments(self, painter, indexes, rect, pixmap):
+        """Blit pixmap, a rendering of rect in clock coordinates, onto the
+        clocks at indexes in one call."""
+        source = QRectF(pixmap.rect())
+        scale_x = rect.width() / source.width()
+        scale_y = rect.height() / source.height()
+        offset = (CELL_SIZE - CLOCK_SIZE) / 2.
+        center = rect.center()
+        fragments = []
+        for index in indexes:
+            row, column = divmod(index, self.columns)
+            fragments.append(QPainter.PixmapFragment.create(
+                QPointF(column * CELL_SIZE + offset + center.x(),
+                        row * CELL_SIZE + offset + center.y()),
+                source, scale_x, scale_y))
+        painter.drawPixmapFragments(fragments, pixmap)
+
+
+class TeamWallView(QGraphicsView):
+    """A window showing a ClockWall, scaled to fit its width."""
+    def __init__(self, wall, parent=None):
+        super(TeamWallView, self).__init__(parent)
+        self.wall = wall
+        self.ticker = ClockTicker.shared()
+        self.setRenderHint(QPainter.Antialiasing)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        scene = QGraphicsScene(self)
+        # One item that redraws itself every tick; an index of it would
+        # only cost time.
+        scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        scene.addItem(wall)
+        self.setScene(scene)
+
+    def resizeEvent(self, evt):
+        super(TeamWallView, self).resizeEvent(evt)
+        rect = self.wall.boundingRect()
+        self.setSceneRect(rect)
+        scale = self.viewport().width() / rect.width()
+        self.resetTransform()
+        self.scale(scale, scale)
+
+    def showEvent(self, evt):
+        super(TeamWallView, self).showEvent(evt)
+        self.ticker.set_visible(self, True)
+
+    def hideEvent(self, evt):
+        super(TeamWallView, self).hideEvent(evt)
+        self.ticker.set_visible(self, False)
+
+
+if __name__ == "__main__":
+    # Demo: a wall of staggered pomodoros.
+    #   python TeamWallView.py [number of clocks]
+    from PyQt5.QtWidgets import QApplication
+    from PomodoroPool import PomodoroPool
+    import PomodoroRotation as palette
+
+    app = QApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool = PomodoroPool()
+    wall = ClockWall([to_color(c) for c in palette.COLORS],
+                     to_color(palette.OUTLINE_COLOR))
+    wall.attach(pool)
+    for i in range(count):
+        name = "clock %d" % i
+        wall.add_clock(name, i)
+        if i % 5:
+            pool.start(name, 60 + (i * 37) % (25 * 60))
+    view = TeamWallView(wall)
+    view.resize(1200, 800)
+    view.show()
+    app.exec_()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Structured, non-blocking logging for the GUI thread.
+
+Events go into a preallocated ring buffer; a background thread drains
+it to a file or socket in batches, so the GUI thread never waits on I/O.
+Events below the configured level are dropped with a single comparison,
+which keeps per-tick and per-paint events close to free when verbose
+output is off.
+
+    from Telemetry import telemetry, DEBUG
+    telemetry.record(DEBUG, "tick", seconds_elapsed, seconds_remaining)
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING"}
+
+
+class Telemetry(object):
+    """A ring buffer of (time, level, kind, a, b) events.
+
+    record() may be called from any thread; it takes a lock only for
+    events at or above the level, so dropped ones stay a comparison. If
+    the drain thread falls a whole buffer behind, the oldest events are
+    overwritten and counted in dropped.
+    """
+    def __init__(self, capacity=4096, level=INFO):
+        self.capacity = capacity
+        self.level = level
+        self.dropped = 0
+        self._times = [0.] * capacity
+        self._levels = [0] * capacity
+        self._kinds = [None] * capacity
+        self._a = [None] * capacity
+        self._b = [None] * capacity
+        self._head = 0   # events ever recorded
+        self._tail = 0   # events ever drained
+        self._sink = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def record(self, level, kind, a=None, b=None):
+        if level < self.level:
+            return
+        with self._lock:
+            slot = self._head % self.capacity
+            self._times[slot] = time.time()
+            self._levels[slot] = level
+            self._kinds[slot] = kind
+            self._a[slot] = a
+            self._b[slot] = b
+            self._head += 1
+
+    def drain(self):
+        """Remove and return the buffered events, oldest first."""
+        head = self._head
+        first = max(self._tail, head - self.capacity)
+        events = []
+        for i in range(first, head):
+            slot = i % self.capacity
+            events.append((self._times[slot], self._levels[slot],
+                           self._kinds[slot], self._a[slot], self._b[slot]))
+        # Anything the writer lapped while we were copying is unreliable.
+        overwritten = max(0, self._head - self.capacity - first)
+        if overwritten:
+            events = events[overwritten:]
+        self.dropped += (first - self._tail) + overwritten
+        self._tail = head
+        return events
+
+    def start(self, sink, interval=1.):
+        """Drain to sink (anything with write() and flush()) from a
+        background thread every interval seconds."""
+        self.stop()
+        self._sink = sink
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name="telemetry")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the drain thread after writing out what is buffered."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self._write(self.drain())
+        self._write(self.drain())
+
+    def _write(self, events):
+        if not events:
+            return
+        lines = []
+        for t, level, kind, a, b in events:
+            fields = [x for x in (a, b) if x is not None]
+            lines.append("%.3f %s %s%s\n" % (
+                t, LEVEL_NAMES.get(level, level), kind,
+                "".join(" %s" % (x,) for x in fields)))
+        try:
+            self._sink.write("".join(lines))
+            self._sink.flush()
+        except (IOError, OSError, socket.error):
+            self.dropped += len(events)
+
+
+def open_sink(target):
+    """A sink for target: "-" for stderr, "unix:PATH" or "tcp:HOST:PORT"
+    for a socket, anything else is a file path to append to."""
+    if target == "-":
+        return sys.stderr
+    if target.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len("unix:"):])
+        return sock.makefile("w")
+    if target.startswith("tcp:"):
+        host, port = target[len("tcp:"):].rsplit(":", 1)
+        return socket.create_connection((host, int(port))).makefile("w")
+    return open(target, "a")
+
+
+# The process-wide instance.
+telemetry = Telemetry()
+
+
+def configure_from_env(environ=os.environ):
+    """Set the level from POCKETWATCH_LOG_LEVEL (DEBUG, INFO, WARNING)
+    and start draining to POCKETWATCH_LOG (default: stderr). If that
+    can't be opened, logging goes to stderr, starting with a warning."""
+    names = dict((v, k) for k, v in LEVEL_NAMES.items())
+    telemetry.level = names.get(environ.get("POCKETWATCH_LOG_LEVEL", "INFO")
+                                .upper(), INFO)
+    target = environ.get("POCKETWATCH_LOG", "-")
+    try:
+        sink = open_sink(target)
+    except (EnvironmentError, ValueError) as e:
+        # An unreachable socket, an unwritable path or a malformed target.
+        sink = sys.stderr
+        telemetry.record(WARNING, "log_sink_failed", target, e)
+    telemetry.start(sink)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""The pomodoro clock in a terminal, for SSH sessions and machines where
+a PyQt5 process is too heavy.
+
+    python TerminalClockView.py [--ascii]
+
+Space or Enter starts the next segment, or finishes the running one
+early, like clicking the overlay; q quits. The remaining and elapsed time
+are drawn as a ring of cells around the clock face, in the same color
+and segment rotation as the overlay.
+
+Nothing from PyQt5 is imported. The overlay's PomodoroDriver runs from a
+select() loop that sleeps until the core's next whole-second wakeup or a
+key press, whichever comes first, and each redraw only rewrites the
+cells that changed.
+"""
+import math
+import os
+import select
+import sys
+import time
+
+from PomodoroDriver import PomodoroDriver
+from PomodoroRotation import PomodoroCycle, PomodoroRotation
+import PomodoroRotation as palette
+from PomodoroSchedule import load_plan
+from VirtualClock import VirtualClock
+
+_monotonic = getattr(time, "monotonic", time.time)
+
+# The ring: 24 cells of two and a half minutes, on an ellipse twice as
+# wide as it is tall since terminal cells are about twice as tall as wide.
+RING_CELLS = 24
+RING_RX = 8
+RING_RY = 4
+# Where the ring is drawn, 1-based like the terminal's own coordinates.
+TOP, LEFT = 2, 3
+
+GLYPHS = {"remaining": u"\u25cf", "elapsed": u"\u25cb", "empty": u"\u00b7",
+          "hand": u"\u25c6"}
+ASCII_GLYPHS = {"remaining": u"#", "elapsed": u"+", "empty": u".",
+                "hand": u"@"}
+
+CSI = u"\x1b["
+
+
+class Signal(object):
+    """Just enough of a Qt signal for the terminal driver: slots are
+    called in the order they were connected."""
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class SelectClock(VirtualClock):
+    """Real monotonic time for a select() loop. Timers are kept the way
+    VirtualClock keeps them; wait() sleeps until the next one is due or
+    a file descriptor becomes readable, then fires whatever is due.
+
+    Time jumps straight to the real time before anything fires, so after
+    a suspend or a stall each overdue timer fires once, late, instead of
+    once for every second that was missed."""
+    def __init__(self):
+        super(SelectClock, self).__init__(self.real_ms())
+
+    @staticmethod
+    def real_ms():
+        return int(_monotonic() * 1000)
+
+    def wait(self, fds):
+        """Block until a timer is due or one of fds is readable; fire the
+        due timers and return the readable fds."""
+        due = self.next_due()
+        timeout = None
+        if due is not None:
+            timeout = max(0, due - self.real_ms()) / 1000.
+        try:
+            readable = select.select(fds, [], [], timeout)[0]
+        except (select.error, OSError, IOError):
+            readable = [] # interrupted by a signal, e.g. a resize
+        self.skip(max(0, self.real_ms() - self.now_ms()))
+        return readable
+
+
+class PlainPomodoroControl(PomodoroDriver):
+    """PomodoroControl without Qt: the same driver and signals, on a clock
+    with the VirtualClock interface."""
+    def __init__(self, clock):
+        self.pomodoro_begin = Signal()
+        self.pomodoro_complete = Signal()
+        # signal: number of seconds elapsed, number of seconds remaining
+        self.time_update = Signal()
+        self.init_driver(clock)
+
+
+def ring_positions(cells=RING_CELLS, rx=RING_RX, ry=RING_RY):
+    """(row, column) of each ring cell, clockwise from 12 o'clock,
+    relative to the top left corner of the ring."""
+    positions = []
+    for k in range(cells):
+        angle = 2 * math.pi * k / cells
+        positions.append((ry - int(round(ry * math.cos(angle))),
+                          rx + int(round(rx * math.sin(angle)))))
+    return positions
+
+
+def ansi_color(color, background=False):
+    """The SGR parameters for a hex color, in 24-bit color."""
+    c = int(color, 16)
+    return u"%d;2;%d;%d;%d" % (48 if background else 38,
+                               c >> 16 & 0xff, c >> 8 & 0xff, c & 0xff)
+
+
+def format_remaining(seconds):
+    seconds = int(math.ceil(seconds))
+    return u"%02d:%02d" % (seconds // 60, seconds % 60)
+
+
+class TerminalClockView(object):
+    """Draws a pomodoro control's state as a ring of text cells.
+
+    Like PomodoroClockView, it only reacts to the control's signals. Each
+    redraw builds the frame as a map of screen position to (text, style)
+    and writes out just the entries that differ from what is already on
+    screen, so a normal tick rewrites the few characters of the
+    countdown and, every two and a half minutes, one ring cell.
+    """
+    def __init__(self, pomodoro_control, out=None, ascii=False):
+        self.pomodoro_control = pomodoro_control
+        self.out = out or sys.stdout
+        self.encoding = getattr(self.out, "encoding", None) or "utf-8"
+        self.glyphs = GLYPHS
+        try:
+            u"".join(GLYPHS.values()).encode(self.encoding)
+        except (UnicodeError, LookupError):
+            ascii = True # the terminal can't show them
+        if ascii:
+            self.glyphs = ASCII_GLYPHS
+        self.positions = ring_positions()
+        self.styles = self.make_styles(palette.COLORS[0],
+                                       palette.OUTLINE_COLOR)
+        self._seconds_elapsed = 0
+        self._seconds_remaining = 0
+        # (row, column) -> (text, style) as currently on screen
+        self._cells = {}
+
+        pomodoro_control.time_update.connect(self.update_time)
+        pomodoro_control.pomodoro_begin.connect(self.redraw)
+        pomodoro_control.pomodoro_complete.connect(self.redraw)
+
+    def set_color(self, color, outline_color):
+        """Colors are hex strings, as in PomodoroRotation."""
+        self.styles = self.make_styles(color, outline_color)
+        self.redraw()
+
+    @staticmethod
+    def make_styles(color, outline_color):
+        """The SGR parameters of each kind of cell, worked out once per
+        color rather than on every redraw."""
+        return {
+            "remaining": ansi_color(color),
+            "elapsed": u"2;" + ansi_color(color),
+            "empty": u"2;" + ansi_color(outline_color),
+            "hand": u"1;" + ansi_color(outline_color),
+            "text": u"1;" + ansi_color(outline_color),
+            }
+
+    def update_time(self, seconds_elapsed, seconds_remaining):
+        self._seconds_elapsed = seconds_elapsed
+        self._seconds_remaining = seconds_remaining
+        self.redraw()
+
+    def cell_states(self, minute_now):
+        """The state of each ring cell, given the minute hand's position.
+        As on the overlay, the remaining arc runs clockwise from the
+        minute hand and the elapsed arc counterclockwise."""
+        if not self.pomodoro_control.is_running:
+            # Covered, like the overlay's obstruction between segments.
+            return ["remaining"] * len(self.positions)
+        remaining = self._seconds_remaining / 60.
+        elapsed = self._seconds_elapsed / 60.
+        step = 60. / len(self.positions)
+        hand = int(round(minute_now / step)) % len(self.positions)
+        states = []
+        for k in range(len(self.positions)):
+            ahead = (k * step - minute_now) % 60
+            if k == hand:
+                states.append("hand")
+            elif ahead < remaining:
+                states.append("remaining")
+            elif 60 - ahead < elapsed:
+                states.append("elapsed")
+            else:
+                states.append("empty")
+        return states
+
+    def frame(self):
+        """The whole picture as {(row, column): (text, style)}."""
+        now = time.localtime()
+        minute_now = now.tm_min + now.tm_sec / 60.
+        styles = self.styles
+        cells = {}
+        for (row, column), state in zip(self.positions,
+                                        self.cell_states(minute_now)):
+            cells[(TOP + row, LEFT + column)] = (self.glyphs[state],
+                                                 styles[state])
+        if self.pomodoro_control.is_running:
+            text = format_remaining(self._seconds_remaining)
+        else:
+            text = u"--:--"
+        cells[(TOP + RING_RY, LEFT + RING_RX - 4)] = (
+            text.center(9), styles["text"])
+        return cells
+
+    def redraw(self):
+        cells = self.frame()
+        changes = []
+        for position, cell in sorted(cells.items()):
+            if self._cells.get(position) != cell:
+                text, style = cell
+                changes.append(u"%s%d;%dH%s0;%sm%s" % (
+                    CSI, position[0], position[1], CSI, style, text))
+        self._cells = cells
+        if changes:
+            changes.append(CSI + u"0m")
+            self.write(u"".join(changes))
+
+    def clear(self):
+        """Forget what is on screen and start over on a blank one."""
+        self._cells = {}
+        self.write(CSI + u"2J")
+        self.redraw()
+
+    def write(self, text):
+        if sys.version_info[0] < 3:
+            text = text.encode(self.encoding, "replace")
+        self.out.write(text)
+        self.out.flush()
+
+
+def main(argv):
+    import termios
+    import tty
+
+    ascii = "--ascii" in argv
+    clock = SelectClock()
+    ctl = PlainPomodoroControl(clock)
+    # The same plan as the overlay's.
+    plan = load_plan(os.path.expanduser("~/.pocketwatch/schedule.json"))
+    rotation = PomodoroRotation(palette.COLORS, plan.compile())
+    view = TerminalClockView(ctl, ascii=ascii)
+
+    def set_color(color):
+        view.set_color(color, palette.OUTLINE_COLOR)
+
+    cycle = PomodoroCycle(ctl, rotation, set_color)
+
+    stdin = sys.stdin.fileno()
+    saved = termios.tcgetattr(stdin)
+    tty.setcbreak(stdin)
+    view.write(CSI + u"?25l")
+    try:
+        view.clear()
+        cycle.next_color()
+        view.write(u"%s%d;%dH%s2mspace: start/finish   q: quit%s0m" % (
+            CSI, TOP + 2 * RING_RY + 2, LEFT, CSI, CSI))
+        while True:
+            if not clock.wait([stdin]):
+                continue
+            key = os.read(stdin, 1)
+            if key in (b"q", b"Q", b"\x04"):
+                break
+            if key in (b" ", b"\n", b"\r"):
+                if ctl.is_running:
+                    ctl.early_finish()
+                else:
+                    cycle.next_pomodoro()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+        view.write(u"%s%d;1H%s0m%s?25h\n" % (
+            CSI, TOP + 2 * RING_RY + 3, CSI, CSI))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""Histograms of how late timers fire and how long ticks take to reach
+the screen.
+
+Every timer that matters records how far past its scheduled time it
+actually woke up, and every painted frame records how long ago the tick
+it shows happened:
+
+    from TimingStats import timing
+    timing.wakeup("PomodoroControl").record(actual_ms - due_ms)
+
+Each histogram is a fixed set of bucket counts, so recording is a bisect
+over a dozen bounds and an increment, with no allocation. Nothing is
+written from the GUI thread; start_dumping() writes all histograms to a
+JSON file from a background thread.
+"""
+import bisect
+import json
+import threading
+import time
+
+from StateSnapshot import write_atomically
+
+# Upper bounds of the buckets, in milliseconds. The first bucket holds
+# wakeups that were early or on time; the last, anything over a second.
+BOUNDS_MS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1000)
+
+_monotonic = getattr(time, "monotonic", time.time)
+
+
+def now_ms():
+    """A monotonic clock in milliseconds, for marking when ticks happen."""
+    return _monotonic() * 1000.
+
+
+class Histogram(object):
+    """Counts of values in the buckets bounded by BOUNDS_MS, plus the
+    count, total and maximum of everything recorded."""
+    def __init__(self, name, bounds=BOUNDS_MS):
+        self.name = name
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """The upper bound of the bucket holding the p'th percentile, or
+        the maximum if that is in the overflow bucket."""
+        if not self.count:
+            return None
+        target = p / 100. * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def state(self):
+        return {"bounds_ms": list(self.bounds), "counts": list(self.counts),
+                "count": self.count, "mean_ms": self.mean(),
+                "max_ms": self.max}
+
+    def summary(self):
+        """One short line: the name, 50th and 99th percentile and the
+        maximum, in milliseconds."""
+        if not self.count:
+            return "%s -" % self.name
+        return "%s %.3g %.3g %.1f" % (self.name, self.percentile(50),
+                                  self.percentile(99), self.max)
+
+
+class TimingStats(object):
+    """The histograms of one process: a wakeup lateness histogram per
+    timer, and one of tick-to-paint latency.
+
+    mark_tick() is called when a tick happens and frame_painted() when a
+    frame has been painted; the first frame after a tick records the
+    time between them.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.tick_to_paint = self.histogram("tick_to_paint")
+        self._tick_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name)
+        return self.histograms[name]
+
+    def wakeup(self, timer_name):
+        """The histogram of how late timer_name fires."""
+        return self.histogram("late:" + timer_name)
+
+    def mark_tick(self):
+        if self._tick_at is None:
+            self._tick_at = now_ms()
+
+    def frame_painted(self):
+        if self._tick_at is not None:
+            self.tick_to_paint.record(now_ms() - self._tick_at)
+            self._tick_at = None
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def summary(self):
+        """A line per histogram, for the debug overlay."""
+        return ["p50 p99 max ms"] + [self.histograms[name].summary()
+                                     for name in sorted(self.histograms)]
+
+    def state(self):
+        return {"time": time.time(),
+                "histograms": dict((name, h.state()) for name, h
+                                   in list(self.histograms.items()))}
+
+    def dump(self, path):
+        write_atomically(path, json.dumps(self.state(), sort_keys=True))
+
+    def start_dumping(self, path, interval=60.):
+        """Write the histograms to path every interval seconds, from a
+        background thread, and once more on stop()."""
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(path, interval),
+                                        name="timing")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, path, interval):
+        while not self._stop.wait(interval):
+            self._dump_quietly(path)
+        self._dump_quietly(path)
+
+    def _dump_quietly(self, path):
+        try:
+            self.dump(path)
+        except (IOError, OSError):
+            pass
+
+
+# The process-wide instance.
+timing = TimingStats()
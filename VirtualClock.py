@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""A clock whose time only moves when it is told to.
+
+Drop it into anything that takes a clock (PomodoroControl, PomodoroPool)
+in place of the real one, then advance() through hours or days of timers
+in milliseconds. Timers fire in due order, one at a time, with now_ms()
+reading exactly their due time, so a run is fully deterministic.
+"""
+import heapq
+
+
+class VirtualTimer(object):
+    """A single-shot timer on a VirtualClock, with the same start/stop
+    interface as a single-shot QTimer."""
+    def __init__(self, clock, callback):
+        self.clock = clock
+        self.callback = callback
+        self.generation = 0
+        self._active = False
+
+    def start(self, delay_ms):
+        self.generation += 1
+        self._active = True
+        self.clock._schedule(self, self.clock.now_ms() + max(0, delay_ms))
+
+    def stop(self):
+        self.generation += 1
+        self._active = False
+
+    def isActive(self):
+        return self._active
+
+    def _fire(self):
+        self._active = False
+        self.callback()
+
+
+class VirtualClock(object):
+    def __init__(self, start_ms=0):
+        self._now = start_ms
+        self._heap = []
+        self._sequence = 0
+        self.fired = 0
+
+    def now_ms(self):
+        return self._now
+
+    def timer(self, callback):
+        """A new single-shot timer that calls callback when it fires."""
+        return VirtualTimer(self, callback)
+
+    def _schedule(self, timer, due):
+        self._sequence += 1
+        heapq.heappush(self._heap, (due, self._sequence, timer,
+                                    timer.generation))
+
+    def next_due(self):
+        """When the next live timer fires, or None if none is pending."""
+        heap = self._heap
+        while heap and heap[0][3] != heap[0][2].generation:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def advance(self, ms):
+        """Move time forward by ms, firing every timer that comes due on
+        the way, including ones that firing timers start."""
+        target = self._now + ms
+        while True:
+            due = self.next_due()
+            if due is None or due > target:
+                break
+            _, _, timer, _ = heapq.heappop(self._heap)
+            self._now = max(self._now, due)
+            self.fired += 1
+            timer._fire()
+        self._now = target
+
+    def skip(self, ms):
+        """Move time forward by ms at once, then fire the timers that are
+        overdue, each once and with now_ms() reading the new time: what
+        a real clock does after the machine was suspended."""
+        self._now += ms
+        self.advance(0)
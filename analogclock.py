@@ -2,67 +2,19 @@
 
 
 
-from PyQt5.QtCore import QPoint, Qt, QTime, QTimer
+from PyQt5.QtCore import QPoint, QRectF, Qt, QTime, QTimer
 from PyQt5.QtGui import QColor, QPainter, QPolygon
 from PyQt5.QtWidgets import QApplication, QWidget, QToolBox
 
-import ctypes
-from ctypes import CFUNCTYPE, c_void_p, c_char_p, c_int, c_long
-import ctypes.util
-
-objc_lib = ctypes.cdll.LoadLibrary(ctypes.util.find_library('objc'))
-id = c_void_p
-sel = c_void_p
-
-sel_registerName = CFUNCTYPE(sel, c_char_p)((b"sel_registerName", objc_lib))
-
-window_sel = sel_registerName(b"window")
-setCollectionBehavior_sel = sel_registerName(b"setCollectionBehavior:")
-setLevel_sel = sel_registerName(b"setLevel:")
-NSWindowCollectionBehaviorFullScreenPrimary = 128
-NSWindowCollectionBehaviorCanJoinAllSpaces = 1 << 0
-NSWindowCollectionBehaviorMoveToActiveSpace = 1 << 1
-NSWindowCollectionBehaviorTransient = 1 << 3
-NSWindowCollectionBehaviorStationary = 1 << 4
-NSWindowCollectionBehaviorFullScreenAuxiliary = 1 << 8
-ctypes.pythonapi.PyCObject_AsVoidPtr.restype = ctypes.c_void_p
-ctypes.pythonapi.PyCObject_AsVoidPtr.argtypes = [ctypes.py_object]
-
-
-send1 = CFUNCTYPE(id, id, sel)((b"objc_msgSend", objc_lib))
-send2 = CFUNCTYPE(None, id, sel, c_long)((b"objc_msgSend", objc_lib))
-PyCObject_AsVoidPtr = ctypes.PYFUNCTYPE(ctypes.c_void_p, ctypes.py_object)(
-                          ('PyCObject_AsVoidPtr', ctypes.pythonapi))
+import OverlayPlatform
+from RenderCache import draw_cached_layer, tick_marks_path
 
 
 def join_all_spaces(qtwin):
-    """Create a full-screen button on qtwin.
+    """Make qtwin visible on every space/desktop.
     The window needs to be already shown.
     """
-    view = qtwin.effectiveWinId()
-    print(view)
-    print(dir(view))
-    print(view.ascobject())
-    cocoawin = send1(PyCObject_AsVoidPtr(view.ascobject()), window_sel)
-    import ctypes, objc
-    _objc = ctypes.PyDLL(objc._objc.__file__)
-    _objc.PyObjCObject_New.restype = ctypes.py_object
-    _objc.PyObjCObject_New.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
-    def objc_object(id):
-        return _objc.PyObjCObject_New(id, 0, 1)
-    objc_object(cocoawin).setCollectionBehavior_(NSWindowCollectionBehaviorFullScreenAuxiliary |
-                                                 NSWindowCollectionBehaviorCanJoinAllSpaces |
-                                                 NSWindowCollectionBehaviorStationary)
-
-    #print(cocoawin)
-    #send2(cocoawin, setCollectionBehavior_sel,
-    #      NSWindowCollectionBehaviorCanJoinAllSpaces |
-    #      NSWindowCollectionBehaviorStationary |
-    #      NSWindowCollectionBehaviorFullScreenAuxiliary
-    #)
-    #send2(cocoawin, setLevel_sel,
-    #      10
-    #)
+    OverlayPlatform.backend().join_all_spaces(qtwin)
 
 
 class AnalogClock(QWidget):
@@ -81,6 +33,11 @@ class AnalogClock(QWidget):
     hourColor = QColor(127, 0, 127)
     minuteColor = QColor(0, 127, 127, 191)
 
+    # The dial, in the 200x200 logical units paintEvent draws in.
+    dialRect = QRectF(-100, -100, 200, 200)
+    hourTicks = tick_marks_path(12, 88, 96)
+    minuteTicks = tick_marks_path(60, 92, 96, skip_every=5)
+
     def __init__(self, parent=None):
         super(AnalogClock, self).__init__(parent)
 
@@ -115,6 +72,11 @@ class AnalogClock(QWidget):
         painter.translate(self.width() / 2, self.height() / 2)
         painter.scale(side / 200.0, side / 200.0)
 
+        # The dial never changes, so it is a cached blit; only the hands
+        # are drawn every frame.
+        draw_cached_layer(painter, AnalogClock.dialRect, ("AnalogClock",),
+                          self.paintDial)
+
         painter.setPen(Qt.NoPen)
         painter.setBrush(AnalogClock.hourColor)
 
@@ -123,13 +85,6 @@ class AnalogClock(QWidget):
         painter.drawConvexPolygon(AnalogClock.hourHand)
         painter.restore()
 
-        painter.setPen(AnalogClock.hourColor)
-
-        for i in range(12):
-            painter.drawLine(88, 0, 96, 0)
-            painter.rotate(30.0)
-
-        painter.setPen(Qt.NoPen)
         painter.setBrush(AnalogClock.minuteColor)
 
         painter.save()
@@ -137,12 +92,12 @@ class AnalogClock(QWidget):
         painter.drawConvexPolygon(AnalogClock.minuteHand)
         painter.restore()
 
+    def paintDial(self, painter):
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(AnalogClock.hourColor)
+        painter.drawPath(AnalogClock.hourTicks)
         painter.setPen(AnalogClock.minuteColor)
-
-        for j in range(60):
-            if (j % 5) != 0:
-                painter.drawLine(92, 0, 96, 0)
-            painter.rotate(6.0)
+        painter.drawPath(AnalogClock.minuteTicks)
 
     def mousePressEvent(self, event):
         self.close()
@@ -151,13 +106,9 @@ class AnalogClock(QWidget):
 if __name__ == '__main__':
 
     import sys
-    import AppKit
-    info = AppKit.NSBundle.mainBundle().infoDictionary()
-    info["LSBackgroundOnly"] = "1"
-    #info["LSUIElement"] = "1"
+    OverlayPlatform.launch_in_background()
 
     app = QApplication(sys.argv)
-    import AppKit
     # # https://developer.apple.com/library/mac/#documentation/AppKit/Reference/NSRunningApplication_Class/Reference/Reference.html
     # NSApplicationActivationPolicyRegular = 0
     # NSApplicationActivationPolicyAccessory = 1
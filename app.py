@@ -1,26 +1,69 @@
+import time
+LAUNCHED_AT = time.time()
+
+import os
 import sys
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QColor, QPainter, QPolygon, QPen, QBrush, QPalette
 
-from PomodoroControl import PomodoroControl
+import OverlayPlatform
+from ClockTheme import THEMES, brighten, to_color
+from pomodoroControl import PomodoroControl
 from PomodoroClockView import PomodoroClockView
+from PomodoroRotation import (
+    COLORS, OUTLINE_COLOR, PomodoroCycle, PomodoroRotation,
+    )
+from PomodoroSchedule import load_plan
+from ControlServer import ControlServer
+from HookDispatcher import HookDispatcher, load_hooks
+from PeerSync import PeerSync
+from SessionLog import SessionLogWriter, SessionRecorder
+from StateSnapshot import StateSnapshotter, load_snapshot
+from StateStream import StateStream
+from Telemetry import telemetry, configure_from_env, INFO, WARNING
+from TimingStats import timing
+
+DATA_DIR = os.path.expanduser("~/.pocketwatch")
+configure_from_env()
+OverlayPlatform.launch_in_background()
 app = QApplication(sys.argv)
+app.aboutToQuit.connect(telemetry.stop)
 
 ctl = PomodoroControl()
+# Segment lengths follow the plan in schedule.json, if there is one.
+plan = load_plan(os.path.join(DATA_DIR, "schedule.json"))
+rotation = PomodoroRotation(COLORS, plan.compile())
+if not os.path.isdir(DATA_DIR):
+    os.makedirs(DATA_DIR)
+session_log = SessionLogWriter(os.path.join(DATA_DIR, "sessions.log"))
+recorder = SessionRecorder(ctl, session_log, rotation)
+app.aboutToQuit.connect(session_log.close)
+
+# Pick up where the last run left off, before the overlay first paints.
+snapshotter = StateSnapshotter(os.path.join(DATA_DIR, "state.json"),
+                               ctl, rotation)
+snapshot = load_snapshot(snapshotter.path)
+resumed = snapshot is not None and snapshotter.restore(snapshot)
+
+# POCKETWATCH_SYNC=1 keeps every instance on the local network on the same
+# pomodoro. It has to hear about transitions before the rotation does.
+peer_sync = None
+if os.environ.get("POCKETWATCH_SYNC"):
+    peer_sync = PeerSync(ctl, rotation)
+
 overlay = PomodoroClockView(ctl)
+overlay.launched_at = LAUNCHED_AT
 overlay.resize(150,150)
 overlay.show()
 
-def to_color(color):
-    c = int(color, 16)
-    return QColor(c >> 16 & 0xff,
-                  c >> 8  & 0xff,
-                  c       & 0xff)
-
-def brighten(color):
-    return QColor(int(color.red() * 0.75 + 64),
-                  int(color.green() * 0.75 + 64),
-                  int(color.blue() * 0.75 + 64))
+# Timer lateness and tick-to-paint histograms: press T on the overlay to
+# show them, or set POCKETWATCH_TIMING_OVERLAY=1. They're written to
+# ~/.pocketwatch/timing.json every minute when POCKETWATCH_TIMING is set.
+if os.environ.get("POCKETWATCH_TIMING_OVERLAY"):
+    overlay.set_timing_overlay(True)
+if os.environ.get("POCKETWATCH_TIMING"):
+    timing.start_dumping(os.path.join(DATA_DIR, "timing.json"))
+    app.aboutToQuit.connect(timing.stop)
 
 # Experimenting with colors
 # some good ones:
@@ -45,17 +88,11 @@ def brighten(color):
 #            brighten(QColor(191,179,90)),
 #          #QColor(242,196,90),
 #          ]
-# Tomorrow theme, https://github.com/chriskempson/tomorrow-theme
-COLORS = map(to_color, ["c82829",
-                        "f5871f",
-                        "eab700",
-                        "718c00",
-                        "3e999f",
-                        "4271ae",
-                        "8959a8",
-                        "4d4d4c",
-                        ])
-OUTLINE_COLOR = to_color("4d4d4c")
+# The palette in use (the Tomorrow theme) lives in PomodoroRotation.py.
+# The themes of each of its colors, and of the hands, are built here,
+# once, so moving on to the next color only swaps which themes the
+# clock's parts use.
+PALETTE_THEMES = THEMES.palette(COLORS, OUTLINE_COLOR)
 
 # http://www.colourlovers.com/palette/845564/its_raining_love
 # This one is also pretty good too.
@@ -91,28 +128,59 @@ OUTLINE_COLOR = to_color("4d4d4c")
 #           QColor(92,55,75),
 #           QColor(74,95,103),
 #           ]
-MINUTES = [25, 5, 25, 5, 25, 5, 25, 15]
-
-def next_color():
-    color = COLORS.pop(0)
-    COLORS.append(color)
-    overlay.set_color(color, OUTLINE_COLOR)
-def next_pomodoro():
-    time = MINUTES.pop(0)
-    MINUTES.append(time)
-    ctl.start(time * 60)
-
-def make_printer(msg):
-    def xx():
-        print msg
+def set_color(color):
+    theme = PALETTE_THEMES[color]
+    overlay.set_color(theme.color, theme.outline_color)
+
+cycle = PomodoroCycle(ctl, rotation, set_color)
+
+def make_logger(kind):
+    def xx(*args):
+        telemetry.record(INFO, kind, *args)
     return xx
 
-overlay.pomodoro_begin_requested.connect(make_printer("Begin requested"))
-overlay.pomodoro_begin_requested.connect(next_pomodoro)
-ctl.pomodoro_complete.connect(next_color)
-overlay.pomodoro_pause_requested.connect(make_printer("Stop requested"))
+overlay.first_frame_painted.connect(make_logger("first_frame_ms"))
+overlay.pomodoro_begin_requested.connect(make_logger("begin_requested"))
+overlay.pomodoro_begin_requested.connect(cycle.next_pomodoro)
+ctl.pomodoro_begin.connect(make_logger("begin"))
+ctl.pomodoro_complete.connect(make_logger("complete"))
+overlay.pomodoro_pause_requested.connect(make_logger("pause_requested"))
 overlay.pomodoro_pause_requested.connect(ctl.early_finish)
+snapshotter.watch()
+
+# User hooks run on worker threads, so a slow one can't stall the overlay.
+hooks = HookDispatcher(load_hooks(os.path.join(DATA_DIR, "hooks.json")))
+hooks.attach(ctl, overlay)
+app.aboutToQuit.connect(hooks.close)
+
+# Accept commands from pocketwatchctl.py; "next" acts like a click.
+control_server = ControlServer(ctl, overlay.pomodoro_begin_requested.emit)
+if not control_server.listen():
+    telemetry.record(WARNING, "control_socket_failed", control_server.path)
+app.aboutToQuit.connect(control_server.close)
+
+if peer_sync is not None and not peer_sync.join():
+    telemetry.record(WARNING, "peer_sync_failed")
+
+# POCKETWATCH_STREAM_PORT=8765 serves the state to dashboards on localhost.
+if os.environ.get("POCKETWATCH_STREAM_PORT"):
+    try:
+        state_stream = StateStream(
+            port=int(os.environ["POCKETWATCH_STREAM_PORT"]))
+        state_stream.start()
+    except (ValueError, EnvironmentError) as e:
+        # A bad port number, or one that is already taken.
+        telemetry.record(WARNING, "state_stream_failed", str(e))
+    else:
+        state_stream.attach(ctl, rotation)
+        app.aboutToQuit.connect(state_stream.stop)
 
-#next_pomodoro()
-next_color()
+#cycle.next_pomodoro()
+if rotation.color_index >= 0 and (resumed or not snapshot.get("running")):
+    # Same segment (or same pause between segments) as before the restart.
+    set_color(rotation.colors[rotation.color_index])
+else:
+    # First run, or the segment finished while we were away.
+    cycle.next_color()
+snapshotter.save()
 app.exec_()
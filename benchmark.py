@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+"""Headless rendering benchmark for the clock scene.
+
+Times paint() for each item of a PomodoroClockView across sizes and
+antialiasing settings, and counts how many repaints each item gets over
+a simulated minute of ticks. Also compares AnalogClock's cached dial with
+drawing its 72 tick marks line by line, times a repaint of a whole
+team wall of clocks, and measures how quickly the window follows a
+fast mouse drag while an animation runs. Runs without a display:
+
+    QT_QPA_PLATFORM=offscreen python benchmark.py [--json results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+from timeit import default_timer
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from PyQt5.QtCore import QEvent, QObject, QPoint, QPointF, Qt, QTime, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QMouseEvent, QPainter
+from PyQt5.QtWidgets import QApplication, QStyleOptionGraphicsItem
+
+from analogclock import AnalogClock
+from ClockTicker import ClockTicker
+from PomodoroClockView import (
+    ClockBack, CircleObstruction, PomodoroClockView, SynchronizedClockHand,
+    TimeElapsedView,
+    )
+from RenderCache import draw_cached_layer
+from TeamWallView import ClockWall
+
+# The view maps scene coordinates (-10, -10, 120, 120) onto the window.
+SCENE_SPAN = 120.
+SIZES = [150, 300, 600]
+WALL_CLOCKS = [100, 400]
+COLOR = QColor(0xc8, 0x28, 0x29)
+OUTLINE_COLOR = QColor(0x4d, 0x4d, 0x4c)
+
+
+class StubPomodoroControl(QObject):
+    """Looks like a PomodoroControl to the view, but never starts a timer;
+    the benchmark sets the time explicitly."""
+    pomodoro_begin = pyqtSignal()
+    pomodoro_complete = pyqtSignal()
+    time_update = pyqtSignal([float, float])
+    def __init__(self, parent=None):
+        super(StubPomodoroControl, self).__init__(parent)
+        self.is_running = False
+    def set_time(self, seconds_elapsed, seconds_remaining):
+        self.is_running = seconds_remaining > 0
+        self.time_update.emit(seconds_elapsed, seconds_remaining)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100. * len(ordered)))]
+
+
+def make_items(control, ticker):
+    """One of each clock item, set up the way PomodoroClockView does."""
+    back = ClockBack(100)
+    back.set_color(COLOR)
+    back.set_outline_color(OUTLINE_COLOR)
+    hand = SynchronizedClockHand("minute", 50, 50, 37, 2, ticker=ticker)
+    hand.set_color(OUTLINE_COLOR)
+    elapsed = TimeElapsedView(100, 15, control, ticker=ticker)
+    elapsed.set_color(COLOR)
+    obstruction = CircleObstruction(100, 25)
+    obstruction.set_color(COLOR)
+    return [back, hand, elapsed, obstruction]
+
+
+def paint_frame(item, image, size, antialias):
+    """Paint item once onto image; return the seconds spent in paint()."""
+    image.fill(0)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing, antialias)
+    painter.scale(size / SCENE_SPAN, size / SCENE_SPAN)
+    painter.translate(10, 10)
+    painter.setTransform(item.sceneTransform(), True)
+    option = QStyleOptionGraphicsItem()
+    start = default_timer()
+    item.paint(painter, option, None)
+    elapsed = default_timer() - start
+    painter.end()
+    return elapsed
+
+
+def allocated_bytes(fn):
+    """Peak bytes allocated by Python while running fn, or None when
+    tracemalloc isn't available (before Python 3.4)."""
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base
+
+
+def live_objects():
+    """Python's count of allocated memory blocks, or on Python 2, of
+    objects the garbage collector tracks."""
+    if hasattr(sys, "getallocatedblocks"):
+        return sys.getallocatedblocks()
+    return len(gc.get_objects())
+
+
+def allocated_objects(fn, frames):
+    """How many more blocks (objects on Python 2) are allocated per call
+    of fn, averaged over frames calls. The collector is off meanwhile,
+    so garbage cycles a frame leaves behind count too."""
+    gc.collect()
+    gc.disable()
+    try:
+        base = live_objects()
+        for i in range(frames):
+            fn()
+        grown = live_objects() - base
+    finally:
+        gc.enable()
+    return float(grown) / frames
+
+
+def bench_paint(items, sizes, frames):
+    results = []
+    for size in sizes:
+        image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        for antialias in (True, False):
+            for item in items:
+                # Warm up caches before measuring steady-state frames.
+                paint_frame(item, image, size, antialias)
+                samples = [paint_frame(item, image, size, antialias)
+                           for i in range(frames)]
+                frame = lambda: paint_frame(item, image, size, antialias)
+                alloc = allocated_bytes(frame)
+                objects = allocated_objects(frame, frames)
+                results.append({
+                    "item": type(item).__name__,
+                    "size": size,
+                    "antialias": antialias,
+                    "p50_us": percentile(samples, 50) * 1e6,
+                    "p90_us": percentile(samples, 90) * 1e6,
+                    "p99_us": percentile(samples, 99) * 1e6,
+                    "alloc_bytes": alloc,
+                    "alloc_objects": objects,
+                    })
+    return results
+
+
+def count_paints(classes):
+    """Patch each class's paint() to count calls by class name. Returns
+    the counts and a function that undoes the patching."""
+    counts = {}
+    originals = {}
+    def counting(cls):
+        original = originals[cls] = cls.paint
+        def paint(self, painter, option, widget):
+            counts[cls.__name__] = counts.get(cls.__name__, 0) + 1
+            return original(self, painter, option, widget)
+        cls.paint = paint
+    for cls in classes:
+        counting(cls)
+    def restore():
+        for cls, original in originals.items():
+            cls.paint = original
+    return counts, restore
+
+
+def count_repaints(app, control, seconds=60):
+    """Simulate a minute of ticks against a real view and count how many
+    times each item class gets painted."""
+    counts, restore = count_paints((ClockBack, SynchronizedClockHand,
+                                    TimeElapsedView, CircleObstruction))
+    try:
+        # Mid-segment, so the view starts without the obstruction animation.
+        control.set_time(0, 25 * 60)
+        view = PomodoroClockView(control)
+        view.resize(150, 150)
+        view.set_color(COLOR, OUTLINE_COLOR)
+        # Drive the shared ticker by hand instead of from the wall clock.
+        ticker = ClockTicker.shared()
+        ticker.stop()
+        view.show()
+        app.processEvents()
+        counts.clear()
+        time = QTime(10, 0, 0)
+        for second in range(seconds):
+            time = time.addSecs(1)
+            ticker.second_changed.emit(time)
+            if time.second() == 0:
+                ticker.minute_changed.emit(time)
+            control.set_time(second + 1, 25 * 60 - second - 1)
+            app.processEvents()
+            app.processEvents()
+        view.hide()
+    finally:
+        restore()
+    return counts
+
+
+def bench_drag(app, control, seconds=1., rate=1000):
+    """Drag the overlay with a mouse reporting rate times a second while
+    the obstruction animation runs. Returns the window moves made, the
+    move latencies and the item paints during the drag."""
+    control.set_time(0, 25 * 60)
+    view = PomodoroClockView(control)
+    view.resize(150, 150)
+    view.set_color(COLOR, OUTLINE_COLOR)
+    view.show()
+    app.processEvents()
+    latencies = []
+    view.window_moved.connect(latencies.append)
+    def mouse(kind, pos, buttons):
+        return QMouseEvent(kind, QPointF(75, 75), QPointF(pos),
+                           Qt.LeftButton, buttons, Qt.NoModifier)
+    origin = view.frameGeometry().topLeft() + QPoint(75, 75)
+    view.mousePressEvent(mouse(QEvent.MouseButtonPress, origin,
+                               Qt.LeftButton))
+    # The same animation a completed segment plays.
+    view.pomodoro_complete()
+    counts, restore = count_paints((ClockBack, SynchronizedClockHand,
+                                    TimeElapsedView, CircleObstruction))
+    events = 0
+    try:
+        start = default_timer()
+        while default_timer() - start < seconds:
+            events += 1
+            pos = origin + QPoint(events % 200, events // 10 % 100)
+            view.mouseMoveEvent(mouse(QEvent.MouseMove, pos, Qt.LeftButton))
+            app.processEvents()
+            # Wait for the mouse's next report.
+            while default_timer() - start < float(events) / rate:
+                pass
+        view.mouseReleaseEvent(mouse(QEvent.MouseButtonRelease, pos,
+                                     Qt.NoButton))
+        app.processEvents()
+    finally:
+        restore()
+    view.hide()
+    # No latencies if not a single move got through.
+    return {
+        "events": events,
+        "moves": len(latencies),
+        "latency_p50_ms": percentile(latencies, 50) if latencies else None,
+        "latency_p99_ms": percentile(latencies, 99) if latencies else None,
+        "latency_max_ms": max(latencies) if latencies else None,
+        "paints": counts,
+        }
+
+
+def paint_dial_lines(painter):
+    """AnalogClock's dial the way it used to be drawn: one drawLine and
+    one rotate per tick mark."""
+    painter.setPen(AnalogClock.hourColor)
+    for i in range(12):
+        painter.drawLine(88, 0, 96, 0)
+        painter.rotate(30.0)
+    painter.setPen(AnalogClock.minuteColor)
+    for j in range(60):
+        if (j % 5) != 0:
+            painter.drawLine(92, 0, 96, 0)
+        painter.rotate(6.0)
+
+
+def bench_dial(sizes, frames):
+    """Per-frame cost of a whole AnalogClock frame, and of its dial drawn
+    line by line, as one path, and from the cache."""
+    clock = AnalogClock()
+    dials = [
+        ("lines", paint_dial_lines),
+        ("path", clock.paintDial),
+        ("cached", lambda painter: draw_cached_layer(
+            painter, AnalogClock.dialRect, ("AnalogClock",), clock.paintDial)),
+        ("full frame", None),
+        ]
+    results = []
+    for size in sizes:
+        clock.resize(size, size)
+        image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        for name, paint_dial in dials:
+            samples = []
+            for i in range(frames + 1):
+                image.fill(0)
+                if paint_dial is None:
+                    start = default_timer()
+                    clock.render(image, QPoint())
+                    samples.append(default_timer() - start)
+                    continue
+                painter = QPainter(image)
+                painter.setRenderHint(QPainter.Antialiasing)
+                painter.translate(size / 2., size / 2.)
+                painter.scale(size / 200., size / 200.)
+                start = default_timer()
+                painter.save()
+                paint_dial(painter)
+                painter.restore()
+                samples.append(default_timer() - start)
+                painter.end()
+            samples = samples[1:]
+            results.append({
+                "dial": name,
+                "size": size,
+                "p50_us": percentile(samples, 50) * 1e6,
+                "p99_us": percentile(samples, 99) * 1e6,
+                })
+    return results
+
+
+def bench_wall(counts, frames):
+    """Per-frame cost of repainting a ClockWall of count clocks, four in
+    five of them running, at 60 device pixels per clock."""
+    results = []
+    for count in counts:
+        wall = ClockWall([COLOR, OUTLINE_COLOR], OUTLINE_COLOR,
+                         ticker=ClockTicker())
+        for i in range(count):
+            wall.add_clock(i, i)
+            if i % 5:
+                wall.start_clock(i, 60 + (i * 37) % (25 * 60), 25 * 60)
+        rect = wall.boundingRect()
+        scale = 0.5
+        image = QImage(int(rect.width() * scale), int(rect.height() * scale),
+                       QImage.Format_ARGB32_Premultiplied)
+        option = QStyleOptionGraphicsItem()
+        option.exposedRect = rect
+        samples = []
+        for i in range(frames + 1):
+            image.fill(0)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.scale(scale, scale)
+            start = default_timer()
+            wall.paint(painter, option, None)
+            samples.append(default_timer() - start)
+            painter.end()
+        samples = samples[1:]
+        results.append({
+            "clocks": count,
+            "p50_us": percentile(samples, 50) * 1e6,
+            "p99_us": percentile(samples, 99) * 1e6,
+            })
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200,
+                        help="frames timed per item, size and setting")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results as JSON to FILE")
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv[:1])
+    control = StubPomodoroControl()
+    control.set_time(5 * 60, 20 * 60)
+    items = make_items(control, ClockTicker())
+
+    paint_results = bench_paint(items, args.sizes, args.frames)
+    print("%-22s %5s %3s %9s %9s %9s %10s %8s" % (
+        "item", "size", "aa", "p50 us", "p90 us", "p99 us", "alloc B",
+        "objs"))
+    for r in paint_results:
+        print("%-22s %5d %3s %9.1f %9.1f %9.1f %10s %8.2f" % (
+            r["item"], r["size"], "on" if r["antialias"] else "off",
+            r["p50_us"], r["p90_us"], r["p99_us"],
+            "n/a" if r["alloc_bytes"] is None else r["alloc_bytes"],
+            r["alloc_objects"]))
+
+    dial_results = bench_dial(args.sizes, args.frames)
+    print("")
+    print("%-22s %5s %9s %9s" % ("AnalogClock dial", "size", "p50 us", "p99 us"))
+    for r in dial_results:
+        print("%-22s %5d %9.1f %9.1f" % (
+            r["dial"], r["size"], r["p50_us"], r["p99_us"]))
+
+    wall_results = bench_wall(WALL_CLOCKS, args.frames)
+    print("")
+    print("%-22s %5s %9s %9s" % ("team wall", "clocks", "p50 us", "p99 us"))
+    for r in wall_results:
+        print("%-22s %5d %9.1f %9.1f" % (
+            "ClockWall", r["clocks"], r["p50_us"], r["p99_us"]))
+
+    repaints = count_repaints(app, StubPomodoroControl())
+    print("")
+    print("repaints per simulated minute:")
+    for name in sorted(repaints):
+        print("  %-22s %d" % (name, repaints[name]))
+
+    drag = bench_drag(app, StubPomodoroControl())
+    print("")
+    print("dragging at 1000 mouse events per second, while animating:")
+    print("  %d events, %d window moves" % (drag["events"], drag["moves"]))
+    print("  move latency p50 %s ms, p99 %s ms, max %s ms" % tuple(
+        "n/a" if drag[key] is None else "%.2f" % drag[key]
+        for key in ("latency_p50_ms", "latency_p99_ms", "latency_max_ms")))
+    for name in sorted(drag["paints"]):
+        print("  %-22s %d paints" % (name, drag["paints"][name]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"paint": paint_results, "dial": dial_results,
+                       "wall": wall_results, "drag": drag,
+                       "repaints_per_minute": repaints},
+                      f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
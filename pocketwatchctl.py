@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Control a running pocketwatch from the command line.
+
+    pocketwatchctl.py start MINUTES   start a segment of MINUTES
+    pocketwatchctl.py next            start the next segment in the rotation
+    pocketwatchctl.py finish          finish the current segment early
+    pocketwatchctl.py status          print elapsed and remaining seconds
+    pocketwatchctl.py watch           print events as they happen
+
+Only the standard library is imported, so a round trip takes
+milliseconds rather than a GUI startup.
+"""
+import math
+import socket
+import sys
+
+from ControlProtocol import socket_path
+
+
+def connect(path=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path or socket_path())
+    return sock
+
+
+def request(sock, reader, line):
+    """Send one request and return the reply line read from reader."""
+    sock.sendall((line + "\n").encode("utf-8"))
+    return reader.readline().decode("utf-8").rstrip("\n")
+
+
+def parse_minutes(text):
+    """text as a positive, finite number of minutes, or None."""
+    try:
+        minutes = float(text)
+    except ValueError:
+        return None
+    if math.isinf(minutes) or math.isnan(minutes) or minutes <= 0:
+        return None
+    return minutes
+
+
+def main(argv):
+    if not argv:
+        sys.stderr.write(__doc__)
+        return 2
+    command = argv[0]
+    minutes = parse_minutes(argv[1]) if len(argv) == 2 else None
+    if command == "start" and minutes is not None:
+        line = "start %s" % (minutes * 60)
+    elif command == "watch" and len(argv) == 1:
+        line = "subscribe"
+    elif command in ("next", "finish", "status") and len(argv) == 1:
+        line = command
+    else:
+        sys.stderr.write(__doc__)
+        return 2
+    try:
+        sock = connect()
+    except socket.error as e:
+        sys.stderr.write("pocketwatch doesn't seem to be running (%s)\n" % e)
+        return 1
+    reader = sock.makefile("rb")
+    reply = request(sock, reader, line)
+    if reply.startswith("error"):
+        sys.stderr.write(reply + "\n")
+        return 1
+    if command == "status":
+        print(reply)
+    elif command == "watch":
+        try:
+            for event in iter(reader.readline, b""):
+                sys.stdout.write(event.decode("utf-8"))
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,46 +1,45 @@
 #!/usr/bin/env python
 
-from PyQt5.QtCore import QObject, pyqtSignal, QTime, QTimer
+from PyQt5.QtCore import QObject, pyqtSignal, Qt, QTime, QTimer, QElapsedTimer
 
+from PomodoroDriver import PomodoroDriver
 
-class PomodoroControl(QObject):
+
+class QtClock(QObject):
+    """The real clock: monotonic time from a QElapsedTimer, and precise
+    single-shot QTimers. VirtualClock has the same interface."""
+    def __init__(self, parent=None):
+        super(QtClock, self).__init__(parent)
+        self.elapsed = QElapsedTimer()
+        self.elapsed.start()
+
+    def now_ms(self):
+        return self.elapsed.elapsed()
+
+    def timer(self, callback):
+        """A new single-shot timer that calls callback when it fires."""
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setTimerType(Qt.PreciseTimer)
+        timer.timeout.connect(callback)
+        return timer
+
+
+class PomodoroControl(QObject, PomodoroDriver):
     """A class that controls pomodoro working segments.
 
-    Warning: May drift because no absolute times are used.
+    This is the Qt driver for a PomodoroCore: PomodoroDriver does the
+    driving, against a clock that supplies monotonic time and precise
+    single-shot timers. The clock is a QtClock unless another one, such
+    as a VirtualClock, is passed in.
     """
     pomodoro_begin = pyqtSignal()
     pomodoro_complete = pyqtSignal()
     time_update = pyqtSignal([float, float])
     # signal: number of seconds elapsed, number of seconds remaining
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, clock=None):
         super(PomodoroControl, self).__init__(parent)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.handle_second)
-        self.seconds_remaining = 0
-        self.seconds_elapsed = 0
-
-    @property
-    def is_running(self):
-        return self.timer.isActive()
-
-    def start(self, seconds_remaining):
-        self.seconds_remaining = seconds_remaining
-        self.seconds_elapsed = 0
-        self.timer.start(1000)
-        self.pomodoro_begin.emit()
-        self.time_update.emit(self.seconds_elapsed, self.seconds_remaining)
-
-    def early_finish(self):
-        self.timer.stop()
-        self.pomodoro_complete.emit()
-
-    def handle_second(self):
-        self.seconds_elapsed += 1
-        self.seconds_remaining -= 1
-        self.time_update.emit(self.seconds_elapsed, self.seconds_remaining)
-        if self.seconds_remaining == 0:
-            self.timer.stop()
-            self.pomodoro_complete.emit()
+        self.init_driver(clock or QtClock(self))
 
 
 if __name__=="__main__":
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Run pomodoro cycles on virtual time.
+
+Drives a real PomodoroControl and the overlay's PomodoroCycle rotation
+from a VirtualClock, so days of segments run in milliseconds and emit
+exactly the signals a real session would. The simulated user starts the
+next segment a fixed delay after each one completes.
+
+    python simulate.py --days 3
+"""
+import argparse
+import sys
+from timeit import default_timer
+
+from PyQt5.QtCore import QCoreApplication
+
+from pomodoroControl import PomodoroControl
+from PomodoroRotation import PomodoroCycle, PomodoroRotation
+from VirtualClock import VirtualClock
+
+
+def simulate(days, restart_delay=10., clock=None, trace=None):
+    """Run days of back-to-back segments on a virtual clock. Every signal
+    is passed to trace(now_ms, name, *args) if given. Returns the
+    control, the rotation and the clock."""
+    clock = clock or VirtualClock()
+    ctl = PomodoroControl(clock=clock)
+    rotation = PomodoroRotation()
+    def record(name):
+        def handler(*args):
+            trace(clock.now_ms(), name, *args)
+        return handler
+    if trace is not None:
+        ctl.pomodoro_begin.connect(record("begin"))
+        ctl.pomodoro_complete.connect(record("complete"))
+        ctl.time_update.connect(record("time_update"))
+    cycle = PomodoroCycle(ctl, rotation,
+                          record("color") if trace else lambda color: None)
+    # The simulated user clicks to start the next segment a little after
+    # each one completes.
+    click = clock.timer(cycle.next_pomodoro)
+    ctl.pomodoro_complete.connect(lambda: click.start(restart_delay * 1000))
+    cycle.next_color()
+    cycle.next_pomodoro()
+    clock.advance(int(days * 24 * 60 * 60 * 1000))
+    return ctl, rotation, clock
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=1.)
+    parser.add_argument("--restart-delay", type=float, default=10.,
+                        help="seconds between a segment ending and the next")
+    parser.add_argument("--trace", action="store_true",
+                        help="print every begin, complete and color change")
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication(sys.argv[:1])
+    counts = {}
+    def trace(now_ms, name, *event_args):
+        counts[name] = counts.get(name, 0) + 1
+        if args.trace and name != "time_update":
+            print("%10.1f s  %s %s" % (now_ms / 1000., name,
+                                      " ".join(str(a) for a in event_args)))
+    start = default_timer()
+    ctl, rotation, clock = simulate(args.days, args.restart_delay, trace=trace)
+    wall = default_timer() - start
+    print("simulated %.1f days in %.3f s: %d timer wakeups, %s" % (
+        args.days, wall, clock.fired,
+        ", ".join("%d %s" % (counts[k], k) for k in sorted(counts))))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])